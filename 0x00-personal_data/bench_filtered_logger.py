@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Throughput of the bulk redaction of a synthetic log file: redact_stream
+(1 worker) against redact_parallel with several worker processes
+
+Run from this directory:
+    python3 bench_filtered_logger.py --workers 1,2,4,8 [--records N]
+Worker counts above the number of cores only measure process overhead.
+"""
+
+import argparse
+import io
+import os
+import random
+import tempfile
+import time
+from typing import List
+
+from filtered_logger import (CHUNK_SIZE, ENGINES, redact_parallel,
+                             redact_stream)
+
+FIELDS = ["email", "phone", "ssn", "password"]
+
+
+def write_log(file_path: str, records: int) -> None:
+    """
+    Writes records synthetic name=...;email=...; lines to file_path.
+    """
+    rng = random.Random(0)
+    with open(file_path, 'w', newline='') as f:
+        for i in range(records):
+            f.write("name=user{0};email=user{0}@example.com;"
+                    "phone={1:010d};ssn={2:09d};password=pw{3};"
+                    "ip=10.0.{4}.{5};last_login=2019-11-14T06:16:24;"
+                    "user_agent=Mozilla/5.0;\n".format(
+                        i, rng.randrange(10 ** 10), rng.randrange(10 ** 9),
+                        rng.randrange(10 ** 6), i // 256 % 256, i % 256))
+
+
+def redact(file_path: str, workers: int, engine: str,
+           chunk_size: int) -> str:
+    """
+    Redacts file_path with workers processes (1: the serial path).
+    """
+    with open(file_path, newline='') as f:
+        if workers == 1:
+            pieces = redact_stream(f, FIELDS, "***", ";", chunk_size,
+                                   engine)
+        else:
+            pieces = redact_parallel(f, FIELDS, "***", ";", chunk_size,
+                                     engine, workers)
+        out = io.StringIO()
+        for piece in pieces:
+            out.write(piece)
+    return out.getvalue()
+
+
+def main(argv: List[str] = None) -> None:
+    """
+    Prints the records per second of each worker count, checking that
+    every run writes the same output as the serial path.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--workers", default="1,2,4",
+                        help="comma-separated worker counts")
+    parser.add_argument("--records", type=int, default=2000000)
+    parser.add_argument("--engine", choices=ENGINES, default="regex")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args(argv)
+    counts = [int(count) for count in args.workers.split(',') if count]
+
+    print("{} records, {} cores, {} engine".format(
+        args.records, os.cpu_count(), args.engine))
+    with tempfile.TemporaryDirectory() as tmp:
+        file_path = os.path.join(tmp, "bench.log")
+        write_log(file_path, args.records)
+        expected = redact(file_path, 1, args.engine, args.chunk_size)
+        for workers in counts:
+            start = time.perf_counter()
+            output = redact(file_path, workers, args.engine,
+                            args.chunk_size)
+            elapsed = time.perf_counter() - start
+            if output != expected:
+                raise SystemExit("{} workers: output differs from serial"
+                                 .format(workers))
+            print("{:3d} workers: {:6.2f}s {:10.0f} records/s".format(
+                workers, elapsed, args.records / elapsed))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,13 +3,398 @@
 Filtered logger module
 """
 
+import argparse
+import logging
+import os
 import re
-from typing import List
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from logging.handlers import QueueHandler, QueueListener
+from queue import Full, Queue
+from typing import (FrozenSet, Iterable, Iterator, List, Pattern, TextIO,
+                    Tuple)
 
 
-def filter_datum(fields: List[str], redaction: str, message: str, separator: str) -> str:
+ENGINES = ("regex", "split")
+OVERFLOW_POLICIES = ("drop", "block", "sample")
+CHUNK_SIZE = 1 << 20
+
+
+@lru_cache(maxsize=128)
+def _compile_pattern(fields: Tuple[str, ...], separator: str) -> Pattern:
+    """
+    Compiles (once per fields/separator pair) the redaction pattern.
+    """
+    return re.compile(
+        r'({})=[^{}]*'.format('|'.join(fields), re.escape(separator)))
+
+
+@lru_cache(maxsize=128)
+def _field_index(fields: Tuple[str, ...]) -> Tuple[FrozenSet[str],
+                                                   Tuple[int, ...]]:
+    """
+    Builds the field lookup set and the distinct field lengths,
+    longest first, used by the split engine.
+    """
+    lengths = sorted({len(field) for field in fields}, reverse=True)
+    return frozenset(fields), tuple(lengths)
+
+
+@lru_cache(maxsize=128)
+def _literal_fields(fields: Tuple[str, ...], separator: str) -> bool:
+    """
+    Tells whether no field name holds a regex metacharacter or the
+    separator: the regex engine does not escape field names, so "a.b"
+    also matches "aXb", and a field name holding the separator spans
+    two of the segments split_redact looks keys up in.
+    """
+    return all(re.escape(field) == field and separator not in field
+               for field in fields)
+
+
+def _split_redact(fields: Tuple[str, ...], redaction: str, message: str,
+                  separator: str) -> str:
+    """
+    Redacts message by splitting it once on separator and looking each
+    key up in a frozenset, without running the regex over the record.
+
+    Produces the same output as the regex engine: a key that merely ends
+    with a field name is redacted from that suffix on, and the rare
+    segment holding a second '=' is handed to the regex engine, as are
+    field names holding regex metacharacters or the separator.
+    """
+    if len(separator) != 1 or separator == '=' or not all(fields) \
+            or '\\' in redaction or not _literal_fields(fields, separator):
+        return _compile_pattern(fields, separator).sub(
+            r'\1={}'.format(redaction), message)
+    names, lengths = _field_index(fields)
+    segments = message.split(separator)
+    for i, segment in enumerate(segments):
+        key, eq, value = segment.partition('=')
+        if not eq:
+            continue
+        if key in names:
+            segments[i] = key + '=' + redaction
+            continue
+        for length in lengths:
+            if length < len(key) and key[-length:] in names:
+                segments[i] = key + '=' + redaction
+                break
+        else:
+            if '=' in value:
+                segments[i] = _compile_pattern(fields, separator).sub(
+                    r'\1={}'.format(redaction), segment)
+    return separator.join(segments)
+
+
+def filter_datum(fields: List[str], redaction: str, message: str,
+                 separator: str, engine: str = "regex") -> str:
     """
     Replaces specified fields in the log message with redaction.
+
+    engine selects the "regex" substitution or the "split" lookup;
+    both return the same result.
     """
-    pattern = re.compile(r'({})=[^{}]*'.format('|'.join(fields), re.escape(separator)))
+    if engine == "split":
+        return _split_redact(tuple(fields), redaction, message, separator)
+    if engine != "regex":
+        raise ValueError("engine must be one of {}".format(ENGINES))
+    pattern = _compile_pattern(tuple(fields), separator)
     return pattern.sub(r'\1={}'.format(redaction), message)
+
+
+class Redactor:
+    """
+    Reusable redactor holding a precompiled pattern for a set of fields.
+    """
+
+    def __init__(self, fields: List[str], redaction: str, separator: str,
+                 engine: str = "regex"):
+        """
+        Initialize a Redactor for the given fields and separator.
+        """
+        if engine not in ENGINES:
+            raise ValueError("engine must be one of {}".format(ENGINES))
+        self.fields = tuple(fields)
+        self.redaction = redaction
+        self.separator = separator
+        self.engine = engine
+        self._pattern = _compile_pattern(self.fields, separator)
+        self._replacement = r'\1={}'.format(redaction)
+
+    def redact(self, message: str) -> str:
+        """
+        Redacts a single message, same output as filter_datum.
+        """
+        if self.engine == "split":
+            return _split_redact(self.fields, self.redaction, message,
+                                 self.separator)
+        return self._pattern.sub(self._replacement, message)
+
+    def redact_many(self, messages: Iterable[str]) -> List[str]:
+        """
+        Redacts a batch of messages.
+        """
+        if self.engine == "split":
+            return [self.redact(message) for message in messages]
+        sub = self._pattern.sub
+        replacement = self._replacement
+        return [sub(replacement, message) for message in messages]
+
+
+class RedactingFormatter(logging.Formatter):
+    """
+    Redacting Formatter class
+    """
+
+    REDACTION = "***"
+    FORMAT = "[HOLBERTON] %(name)s %(levelname)s %(asctime)-15s: %(message)s"
+    SEPARATOR = ";"
+
+    def __init__(self, fields: List[str], engine: str = "regex"):
+        """
+        Initialize the formatter with the fields to redact.
+        """
+        super(RedactingFormatter, self).__init__(self.FORMAT)
+        self.fields = list(fields)
+        self._redactor = Redactor(fields, self.REDACTION, self.SEPARATOR,
+                                  engine)
+
+    def format(self, record: logging.LogRecord) -> str:
+        """
+        Formats the record and redacts the configured fields.
+        """
+        return self._redactor.redact(super().format(record))
+
+
+class BoundedQueueHandler(QueueHandler):
+    """
+    QueueHandler over a bounded queue with an overflow policy.
+
+    On a full queue, "drop" discards the record, "block" waits for room
+    and "sample" waits for room for one record in every sample_rate and
+    discards the others. Redaction and I/O are left to the QueueListener
+    thread draining the queue.
+    """
+
+    def __init__(self, queue: Queue, policy: str = "drop",
+                 sample_rate: int = 100):
+        """
+        Initialize the handler on queue with the given overflow policy.
+        """
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(
+                "policy must be one of {}".format(OVERFLOW_POLICIES))
+        super().__init__(queue)
+        self.policy = policy
+        self.sample_rate = max(1, sample_rate)
+        self.dropped = 0
+        self._overflowed = 0
+
+    @property
+    def depth(self) -> int:
+        """
+        Approximate number of records waiting in the queue.
+        """
+        return self.queue.qsize()
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        """
+        Puts record on the queue, applying the overflow policy.
+        """
+        if self.policy == "block":
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+            return
+        except Full:
+            self._overflowed += 1
+        if self.policy == "sample" \
+                and self._overflowed % self.sample_rate == 0:
+            self.queue.put(record)
+        else:
+            self.dropped += 1
+
+
+class DrainingQueueListener(QueueListener):
+    """
+    QueueListener whose stop() waits for room in a bounded queue instead
+    of failing when the queue is full.
+    """
+
+    def enqueue_sentinel(self) -> None:
+        """
+        Puts the stop sentinel on the queue, blocking if needed.
+        """
+        self.queue.put(self._sentinel)
+
+
+def get_async_logger(name: str, fields: List[str], *handlers: logging.Handler,
+                     maxsize: int = 10000, policy: str = "drop",
+                     engine: str = "regex") -> Tuple[logging.Logger,
+                                                     DrainingQueueListener]:
+    """
+    Returns a logger whose records go through a BoundedQueueHandler to
+    a started QueueListener that redacts fields and writes to handlers
+    (a stderr StreamHandler by default). Call listener.stop() to flush.
+    """
+    if not handlers:
+        handlers = (logging.StreamHandler(),)
+    formatter = RedactingFormatter(fields, engine)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    queue_handler = BoundedQueueHandler(Queue(maxsize), policy)
+    listener = DrainingQueueListener(queue_handler.queue, *handlers,
+                                     respect_handler_level=True)
+
+    logger = logging.getLogger(name)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    logger.addHandler(queue_handler)
+    listener.start()
+    return logger, listener
+
+
+def _read_blocks(stream: TextIO, chunk_size: int) -> Iterator[str]:
+    """
+    Reads stream in chunks of chunk_size characters and yields blocks
+    that end on a record (newline) boundary. A record cut by a chunk
+    boundary is carried over to the next block; the last block may lack
+    a trailing newline.
+    """
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive")
+    tail = ''
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        chunk = tail + chunk
+        cut = chunk.rfind('\n') + 1
+        tail = chunk[cut:]
+        if cut:
+            yield chunk[:cut]
+    if tail:
+        yield tail
+
+
+def _redact_block(fields: Tuple[str, ...], redaction: str, separator: str,
+                  engine: str, block: str) -> str:
+    """
+    Redacts every record of a block, one line at a time. A '\r' ending a
+    line is a line ending, not part of its last field: it is kept.
+    """
+    redactor = Redactor(fields, redaction, separator, engine)
+    lines = block.split('\n')
+    if '\r' not in block:
+        return '\n'.join(redactor.redact_many(lines))
+    ends = ['\r' if line.endswith('\r') else '' for line in lines]
+    records = [line[:-1] if end else line for line, end in zip(lines, ends)]
+    return '\n'.join(record + end for record, end
+                     in zip(redactor.redact_many(records), ends))
+
+
+def redact_stream(stream: TextIO, fields: List[str], redaction: str,
+                  separator: str, chunk_size: int = CHUNK_SIZE,
+                  engine: str = "regex") -> Iterator[str]:
+    """
+    Reads stream in chunks of chunk_size characters and yields it back
+    redacted, one newline-terminated record at a time as filter_datum
+    would. Line endings ('\n' or '\r\n') are kept as they are, so open
+    the stream with newline=''. Memory stays bounded by chunk_size plus
+    the longest record.
+    """
+    fields = tuple(fields)
+    for block in _read_blocks(stream, chunk_size):
+        yield _redact_block(fields, redaction, separator, engine, block)
+
+
+def redact_parallel(stream: TextIO, fields: List[str], redaction: str,
+                    separator: str, chunk_size: int = CHUNK_SIZE,
+                    engine: str = "regex",
+                    workers: int = None) -> Iterator[str]:
+    """
+    Same output as redact_stream, but blocks are redacted in a pool of
+    worker processes (os.cpu_count() by default). Blocks are yielded in
+    their original order and at most two per worker are in flight, so
+    memory stays bounded as in the serial path.
+    """
+    fields = tuple(fields)
+    workers = workers or os.cpu_count() or 1
+    window = 2 * workers
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for block in _read_blocks(stream, chunk_size):
+            pending.append(executor.submit(_redact_block, fields, redaction,
+                                           separator, engine, block))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _positive_int(value: str) -> int:
+    """
+    argparse type of a strictly positive integer.
+    """
+    number = int(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(
+            "must be positive: {}".format(value))
+    return number
+
+
+def main(argv: List[str] = None) -> None:
+    """
+    Redacts a log file (or stdin) to stdout (or --output).
+    """
+    parser = argparse.ArgumentParser(
+        prog="filtered_logger",
+        description="Redact PII fields from separator-delimited logs.")
+    parser.add_argument("input", nargs="?", default="-",
+                        help="log file to read, '-' for stdin")
+    parser.add_argument("--fields", required=True,
+                        help="comma-separated field names to redact")
+    parser.add_argument("--redaction", default="***")
+    parser.add_argument("--separator", default=";")
+    parser.add_argument("--chunk-size", type=_positive_int,
+                        default=CHUNK_SIZE)
+    parser.add_argument("--engine", choices=ENGINES, default="regex")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="worker processes, 0 for one per core")
+    parser.add_argument("-o", "--output", default="-",
+                        help="file to write, '-' for stdout")
+    args = parser.parse_args(argv)
+    fields = [field for field in args.fields.split(',') if field]
+
+    # line endings pass through untranslated, for files and std streams
+    for name, stream in ((args.input, sys.stdin), (args.output, sys.stdout)):
+        if name == "-" and hasattr(stream, 'reconfigure'):
+            stream.reconfigure(newline='')
+    src = sys.stdin if args.input == "-" else open(args.input, newline='')
+    dst = sys.stdout if args.output == "-" \
+        else open(args.output, 'w', newline='')
+    if args.workers == 1:
+        pieces = redact_stream(src, fields, args.redaction, args.separator,
+                               args.chunk_size, args.engine)
+    else:
+        pieces = redact_parallel(src, fields, args.redaction,
+                                 args.separator, args.chunk_size,
+                                 args.engine, args.workers or None)
+    try:
+        for piece in pieces:
+            dst.write(piece)
+    finally:
+        if src is not sys.stdin:
+            src.close()
+        if dst is not sys.stdout:
+            dst.close()
+
+
+if __name__ == "__main__":
+    main()
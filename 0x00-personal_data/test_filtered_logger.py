@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Parity tests of the redaction engines of filtered_logger
+"""
+
+import io
+import os
+import random
+import tempfile
+import unittest
+from contextlib import redirect_stderr
+
+from filtered_logger import Redactor, filter_datum, main, redact_stream
+
+
+def both(fields, redaction, message, separator):
+    """
+    Output of the regex and the split engines for the same input.
+    """
+    return (filter_datum(fields, redaction, message, separator),
+            filter_datum(fields, redaction, message, separator,
+                         engine="split"))
+
+
+class TestEngineParity(unittest.TestCase):
+    """
+    The split engine must return exactly what the regex engine returns
+    """
+
+    def assertParity(self, fields, message, separator=';',
+                     redaction='xxx'):
+        """
+        Asserts both engines agree on one input.
+        """
+        regex, split = both(fields, redaction, message, separator)
+        self.assertEqual(split, regex, (fields, message, separator))
+
+    def test_main_example(self):
+        """ The messages of main.py """
+        fields = ["password", "date_of_birth"]
+        message = ("name=egg;email=eggmin@eggsample.com;password=eggcellent;"
+                   "date_of_birth=12/12/1986;")
+        self.assertEqual(
+            filter_datum(fields, 'xxx', message, ';', engine="split"),
+            "name=egg;email=eggmin@eggsample.com;password=xxx;"
+            "date_of_birth=xxx;")
+        self.assertParity(fields, message)
+
+    def test_empty_values(self):
+        """ Fields with nothing after '=' """
+        self.assertParity(["password"], "password=;name=a;")
+        self.assertParity(["password", "name"], "password=;name=;")
+        self.assertParity(["password"], "")
+        self.assertParity(["password"], ";;;")
+
+    def test_repeated_keys(self):
+        """ The same field several times in one record """
+        self.assertParity(["password"], "password=a;password=b;password=c")
+        self.assertParity(["ssn", "password"],
+                          "ssn=1;password=a;ssn=2;name=x;ssn=3;")
+
+    def test_missing_trailing_separator(self):
+        """ Last field not followed by the separator """
+        self.assertParity(["password"], "name=bob;password=secret")
+        self.assertParity(["name"], "name=bob")
+
+    def test_key_suffix(self):
+        """ Keys merely ending with a field name, or containing it """
+        self.assertParity(["password"], "old_password=a;password_x=b;")
+        self.assertParity(["name", "e"], "username=a;e=b;same=c;")
+
+    def test_equal_signs_in_values(self):
+        """ Values holding '=' and keys without one """
+        self.assertParity(["password"], "password=a=b;note=password=c;")
+        self.assertParity(["password"], "password;password=;x=password")
+
+    def test_separators(self):
+        """ Other, multi-character and regex special separators """
+        for separator in (',', '|', '.', '\t', '&&', '='):
+            self.assertParity(["password", "name"],
+                              separator.join(["name=a", "password=b",
+                                              "x=c", "password=d"]),
+                              separator)
+
+    def test_metacharacter_field_names(self):
+        """ Field names are regex fragments for the regex engine """
+        self.assertParity(["pass.word"], "passXword=a;pass.word=b;")
+        self.assertParity(["a+"], "aaa=1;a+=2;")
+        self.assertParity(["x|name"], "x=1;name=2;x|name=3;")
+
+    def test_separator_in_field_names(self):
+        """ A field name holding the separator spans two segments """
+        self.assertParity(["a;b"], "a;b=1;")
+        self.assertParity(["x;", "name"], "x;=1;name=2;b=3;")
+        self.assertParity(["a,b"], "a,b=1,c=2,", separator=",")
+
+    def test_redaction_escapes(self):
+        """ Backslashes in the redaction string """
+        self.assertParity(["password"], "password=a;", redaction=r'\\')
+
+    def test_empty_field(self):
+        """ An empty field name matches every '=' """
+        self.assertParity(["", "name"], "name=a;x=b;")
+
+    def test_random(self):
+        """ Random records over a small alphabet """
+        rng = random.Random(0)
+        alphabet = "ab=;.|x"
+        for _ in range(20000):
+            fields = ["".join(rng.choice("ab.x") for _ in range(
+                rng.randint(1, 3))) for _ in range(rng.randint(1, 3))]
+            message = "".join(rng.choice(alphabet)
+                              for _ in range(rng.randint(0, 20)))
+            separator = rng.choice(";|.")
+            self.assertParity(fields, message, separator)
+
+
+class TestRedactor(unittest.TestCase):
+    """
+    Redactor matches filter_datum with both engines
+    """
+
+    def test_redact_many(self):
+        """ Batch redaction """
+        fields = ["email", "password"]
+        messages = ["name=a;email=a@b;password=c;", "email=;x=y",
+                    "password=a=b;email"]
+        expected = [filter_datum(fields, '***', m, ';') for m in messages]
+        for engine in ("regex", "split"):
+            redactor = Redactor(fields, '***', ';', engine)
+            self.assertEqual(redactor.redact_many(messages), expected)
+            self.assertEqual([redactor.redact(m) for m in messages],
+                             expected)
+
+    def test_unknown_engine(self):
+        """ Engine names are checked """
+        with self.assertRaises(ValueError):
+            filter_datum(["a"], 'x', "a=1", ';', engine="fast")
+        with self.assertRaises(ValueError):
+            Redactor(["a"], 'x', ';', engine="fast")
+
+
+class TestStream(unittest.TestCase):
+    """
+    Streaming redaction, across chunk boundaries and line endings
+    """
+
+    records = ["name=a;password=x", "name=b;password=", "ssn=1;name=c",
+               "password=y;last=1;password=z"]
+
+    def redact(self, text, chunk_size):
+        """ redact_stream over text """
+        return "".join(redact_stream(io.StringIO(text, newline=''),
+                                     ["password", "name"], "***", ';',
+                                     chunk_size))
+
+    def test_chunk_boundaries(self):
+        """ Same output whatever the chunk size """
+        for newline in ("\n", "\r\n"):
+            text = newline.join(self.records)
+            expected = newline.join(filter_datum(["password", "name"],
+                                                 "***", record, ';')
+                                    for record in self.records)
+            for chunk_size in range(1, len(text) + 2):
+                self.assertEqual(self.redact(text, chunk_size), expected)
+                self.assertEqual(self.redact(text + newline, chunk_size),
+                                 expected + newline)
+
+    def test_bad_chunk_size(self):
+        """ A chunk size below 1 would read nothing """
+        for chunk_size in (0, -1):
+            with self.assertRaises(ValueError):
+                self.redact("password=x", chunk_size)
+            with self.assertRaises(SystemExit), \
+                    redirect_stderr(io.StringIO()):
+                main(["--fields", "password", "--chunk-size",
+                      str(chunk_size), os.devnull])
+
+    def test_main_line_endings(self):
+        """ The CLI keeps CRLF line endings """
+        with tempfile.TemporaryDirectory() as tmp:
+            src, dst = os.path.join(tmp, "in"), os.path.join(tmp, "out")
+            with open(src, 'wb') as f:
+                f.write(b"name=a;password=x\r\nssn=1;password=y\r\n")
+            main(["--fields", "password", "--chunk-size", "5", src,
+                  "-o", dst])
+            with open(dst, 'rb') as f:
+                self.assertEqual(
+                    f.read(), b"name=a;password=***\r\nssn=1;password=***\r\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,6 +4,7 @@ Route Module for the API
 """
 
 from os import getenv
+from api.v1.auth.auth import PathMatcher
 from api.v1.views import app_views
 from flask import Flask, jsonify, abort, request
 from flask_cors import CORS
@@ -14,7 +15,7 @@ CORS(app, resources={r"/api/v1/*": {"origins": "*"}})
 
 # Determine the authentication method based on the environment variable
 auth = None
-AUTH_TYPE = os.getenv("AUTH_TYPE")
+AUTH_TYPE = getenv("AUTH_TYPE")
 if AUTH_TYPE == "auth":
     from api.v1.auth.auth import Auth
     auth = Auth()
@@ -30,6 +31,20 @@ elif AUTH_TYPE == "session_exp_auth":
 elif AUTH_TYPE == "session_db_auth":
     from api.v1.auth.session_db_auth import SessionDBAuth
     auth = SessionDBAuth()
+elif AUTH_TYPE == "signed_session_auth":
+    from api.v1.auth.signed_session_auth import SignedSessionAuth
+    auth = SignedSessionAuth()
+# Views read the active authentication here: under "python3 -m api.v1.app"
+# importing api.v1.app would load a second module with its own instance
+app.config['AUTH'] = auth
+
+# Paths served without authentication, compiled once
+EXCLUDED_PATHS = PathMatcher([
+    '/api/v1/status/',
+    '/api/v1/unauthorized/',
+    '/api/v1/forbidden/',
+    '/api/v1/auth_session/login/'
+])
 
 @app.before_request
 def before_request():
@@ -39,18 +54,13 @@ def before_request():
     Filters each request before it's handled by the proper route.
     """
     if auth is not None:
-        setattr(request, "current_user", auth.current_user(request))
-        excluded = [
-            '/api/v1/status/',
-            '/api/v1/unauthorized/',
-            '/api/v1/forbidden/',
-            '/api/v1/auth_session/login/'
-        ]
-        if auth.require_auth(request.path, excluded):
+        user = auth.resolve_user(request)
+        setattr(request, "current_user", user)
+        if auth.require_auth(request.path, EXCLUDED_PATHS):
             cookie = auth.session_cookie(request)
             if auth.authorization_header(request) is None and cookie is None:
                 abort(401, description="Unauthorized")
-            if auth.current_user(request) is None:
+            if user is None:
                 abort(403, description="Forbidden")
 
 @app.errorhandler(404)
@@ -1,8 +1,64 @@
 #!/usr/bin/env python3
 """Authentication module."""
-from flask import request
-from typing import List, TypeVar
+from flask import g, request
+from functools import lru_cache
+from typing import Iterable, List, TypeVar
 import fnmatch
+import os
+import re
+
+
+# Characters giving a pattern a wildcard meaning for fnmatch
+_WILDCARD = re.compile(r'[*?[]')
+
+
+class PathMatcher:
+    """Precompiled set of fnmatch patterns.
+
+    Plain paths are looked up in a set and wildcard patterns are tried
+    as one combined regular expression, so matching a path costs the
+    same whatever the number of patterns.
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        """Compile the patterns.
+
+        Args:
+            patterns: fnmatch patterns, matched like fnmatch.fnmatch.
+        """
+        self.patterns = tuple(os.path.normcase(p) for p in patterns)
+        self._exact = frozenset(p for p in self.patterns
+                                if not _WILDCARD.search(p))
+        wildcards = [fnmatch.translate(p) for p in self.patterns
+                     if _WILDCARD.search(p)]
+        self._wildcards = None
+        if wildcards:
+            self._wildcards = re.compile("|".join(wildcards))
+
+    def __len__(self) -> int:
+        """Number of patterns."""
+        return len(self.patterns)
+
+    def match(self, path: str) -> bool:
+        """Check if a path matches one of the patterns.
+
+        Args:
+            path: The path to be checked.
+
+        Returns:
+            True if the path matches a pattern, False otherwise.
+        """
+        path = os.path.normcase(path)
+        if path in self._exact:
+            return True
+        return self._wildcards is not None \
+            and self._wildcards.match(path) is not None
+
+
+@lru_cache(maxsize=32)
+def _path_matcher(patterns: tuple) -> PathMatcher:
+    """PathMatcher of a tuple of patterns, compiled once."""
+    return PathMatcher(patterns)
 
 
 class Auth:
@@ -11,9 +67,13 @@ class Auth:
     def require_auth(self, path: str, excluded_paths: List[str]) -> bool:
         """Check if authentication is required for the given path.
 
+        A path without a trailing slash is also excluded by a pattern
+        matching it with one.
+
         Args:
             path: The path to be checked for authentication requirement.
-            excluded_paths: List of paths that are excluded from authentication.
+            excluded_paths: List of paths that are excluded from authentication
+                (fnmatch patterns), or a PathMatcher compiled from them.
 
         Returns:
             True if authentication is required, False otherwise.
@@ -24,9 +84,12 @@ class Auth:
         if excluded_paths is None or not excluded_paths:
             return True
 
-        for excluded_path in excluded_paths:
-            if fnmatch.fnmatch(path, excluded_path):
-                return False
+        if not isinstance(excluded_paths, PathMatcher):
+            excluded_paths = _path_matcher(tuple(excluded_paths))
+        if excluded_paths.match(path):
+            return False
+        if not path.endswith('/') and excluded_paths.match(path + '/'):
+            return False
 
         return True
 
@@ -43,9 +106,25 @@ class Auth:
             return request.headers.get('Authorization', None)
         return None
 
+    def session_cookie(self, request=None) -> str:
+        """Get the session cookie from the request.
+
+        Args:
+            request: Flask request object.
+
+        Returns:
+            The value of the cookie named by SESSION_NAME if present,
+            else None.
+        """
+        if request is not None:
+            return request.cookies.get(os.getenv('SESSION_NAME'))
+        return None
+
     def current_user(self, request=None) -> TypeVar('User'):
         """Retrieve the current user from the request.
 
+        Subclasses override this method; callers go through resolve_user.
+
         Args:
             request: Flask request object.
 
@@ -53,3 +132,26 @@ class Auth:
             User object if authenticated, else None.
         """
         return None
+
+    def resolve_user(self, request=None) -> TypeVar('User'):
+        """Retrieve the current user once per request.
+
+        The result of current_user is memoized in flask.g, so the rest of
+        the request gets it without another lookup.
+
+        Args:
+            request: Flask request object.
+
+        Returns:
+            User object if authenticated, else None.
+        """
+        try:
+            memo = g.get('_current_user')
+        except RuntimeError:
+            # outside of an application context, nowhere to memoize
+            return self.current_user(request)
+        if memo is not None and memo[0] is self and memo[1] is request:
+            return memo[2]
+        user = self.current_user(request)
+        g._current_user = (self, request, user)
+        return user
@@ -1,16 +1,157 @@
 #!/usr/bin/env python3
 """Basic authentication module for the API."""
+import os
 import re
-import base64
 import binascii
-from typing import Tuple, TypeVar
+import hashlib
+import hmac
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Tuple, TypeVar
 
 from .auth import Auth
 from models.user import User
 
 
+# Input accepted by base64.b64decode(validate=True) on Pythons whose
+# binascii has no strict mode (before 3.11)
+_BASE64 = re.compile(rb'[A-Za-z0-9+/]*={0,2}')
+try:
+    binascii.a2b_base64(b'', strict_mode=True)
+    _STRICT_BASE64 = True
+except TypeError:
+    _STRICT_BASE64 = False
+
+
+def _b64decode(data: bytes) -> bytes:
+    """Decodes base64 bytes exactly as base64.b64decode(validate=True).
+
+    Args:
+        data: The base64 encoded bytes.
+
+    Returns:
+        The decoded bytes; raises binascii.Error if data is invalid.
+    """
+    if _STRICT_BASE64:
+        return binascii.a2b_base64(data, strict_mode=True)
+    if _BASE64.fullmatch(data) is None:
+        raise binascii.Error("Non-base64 digit found")
+    return binascii.a2b_base64(data)
+
+
+class CredentialCache:
+    """Bounded LRU cache, with a TTL, of verified Authorization headers.
+
+    Entries are keyed on a keyed BLAKE2b hash (a MAC) of the header under
+    a random per-process key, so the cache never holds the credentials.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 300):
+        """Initialize an empty cache.
+
+        Args:
+            max_size: Maximum number of entries, least recently used
+                entries are evicted first.
+            ttl: Lifetime of an entry in seconds.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._secret = os.urandom(32)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, authorization_header: str) -> bytes:
+        """Compute the cache key of an Authorization header.
+
+        Args:
+            authorization_header: The Authorization header string.
+
+        Returns:
+            The keyed hash of the header.
+        """
+        return hashlib.blake2b(authorization_header.encode('utf-8'),
+                               key=self._secret, digest_size=16).digest()
+
+    def get(self, key: bytes, load: Callable) -> object:
+        """Look up a live entry and load what it refers to.
+
+        Args:
+            key: Cache key of the header.
+            load: Called with the cached value, returns the result or
+                None if the entry is no longer valid (it is then dropped).
+
+        Returns:
+            The result of load, or None on a miss.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < now:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        result = load(entry[1])
+        if result is None:
+            with self._lock:
+                self.hits -= 1
+                self.misses += 1
+                self._entries.pop(key, None)
+        return result
+
+    def put(self, key: bytes, value: object):
+        """Store a value for a key, evicting the oldest entries if full.
+
+        Args:
+            key: Cache key of the header.
+            value: Value handed to load on later lookups.
+        """
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        """Report the cache metrics.
+
+        Returns:
+            Dictionary of hits, misses, evictions and current size.
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "evictions": self.evictions, "size": len(self._entries)}
+
+
 class BasicAuth(Auth):
-    """Class implementing Basic authentication."""
+    """Class implementing Basic authentication.
+
+    Verified credentials are cached (see CredentialCache), sized and timed
+    by the BASIC_AUTH_CACHE_SIZE (0 disables the cache) and
+    BASIC_AUTH_CACHE_TTL (seconds) environment variables.
+    """
+
+    def __init__(self):
+        """Initialize the credential cache from the environment."""
+        try:
+            cache_size = int(os.getenv('BASIC_AUTH_CACHE_SIZE', 1024))
+        except ValueError:
+            cache_size = 1024
+        try:
+            cache_ttl = float(os.getenv('BASIC_AUTH_CACHE_TTL', 300))
+        except ValueError:
+            cache_ttl = 300
+        self.credential_cache = None
+        if cache_size > 0:
+            self.credential_cache = CredentialCache(cache_size, cache_ttl)
 
     def extract_base64_authorization_header(
             self,
@@ -25,10 +166,10 @@ class BasicAuth(Auth):
             The Base64 token string if found, else None.
         """
         if type(authorization_header) == str:
-            pattern = r'Basic (?P<token>.+)'
-            field_match = re.fullmatch(pattern, authorization_header.strip())
-            if field_match is not None:
-                return field_match.group('token')
+            header = authorization_header.strip()
+            token = header[6:]
+            if header.startswith('Basic ') and token and '\n' not in token:
+                return token
         return None
 
     def decode_base64_authorization_header(
@@ -44,11 +185,10 @@ class BasicAuth(Auth):
             The decoded string if successfully decoded, else None.
         """
         if type(base64_authorization_header) == str:
+            if not base64_authorization_header.isascii():
+                return None
             try:
-                res = base64.b64decode(
-                    base64_authorization_header,
-                    validate=True,
-                )
+                res = _b64decode(base64_authorization_header.encode('ascii'))
                 return res.decode('utf-8')
             except (binascii.Error, UnicodeDecodeError):
                 return None
@@ -67,14 +207,9 @@ class BasicAuth(Auth):
             Tuple containing user email and password.
         """
         if type(decoded_base64_authorization_header) == str:
-            pattern = r'(?P<user>[^:]+):(?P<password>.+)'
-            field_match = re.fullmatch(
-                pattern,
-                decoded_base64_authorization_header.strip(),
-            )
-            if field_match is not None:
-                user = field_match.group('user')
-                password = field_match.group('password')
+            user, _, password = \
+                decoded_base64_authorization_header.strip().partition(':')
+            if user and password and '\n' not in password:
                 return user, password
         return None, None
 
@@ -105,6 +240,9 @@ class BasicAuth(Auth):
     def current_user(self, request=None) -> TypeVar('User'):
         """Retrieves the user object from a request.
 
+        A header verified before is served from the credential cache as
+        long as the user still exists with the same password.
+
         Args:
             request: Flask request object.
 
@@ -112,7 +250,44 @@ class BasicAuth(Auth):
             User object if authenticated, else None.
         """
         auth_header = self.authorization_header(request)
+        cache = self.credential_cache
+        cache_key = None
+        if cache is not None and type(auth_header) == str:
+            cache_key = cache.key(auth_header)
+            user = cache.get(cache_key, self._cached_user)
+            if user is not None:
+                return user
         b64_auth_token = self.extract_base64_authorization_header(auth_header)
         auth_token = self.decode_base64_authorization_header(b64_auth_token)
         email, password = self.extract_user_credentials(auth_token)
-        return self.user_object_from_credentials(email, password)
+        user = self.user_object_from_credentials(email, password)
+        if user is not None and cache_key is not None:
+            cache.put(cache_key, (user.id, user.password))
+        return user
+
+    @staticmethod
+    def _cached_user(entry: Tuple[str, str]) -> TypeVar('User'):
+        """Loads the user of a credential cache entry.
+
+        Args:
+            entry: User ID and password hash at verification time.
+
+        Returns:
+            The user, or None if it was removed or its password changed.
+        """
+        user = User.get(entry[0])
+        if user is None or type(user.password) != str \
+                or not hmac.compare_digest(user.password, entry[1]):
+            return None
+        return user
+
+    def cache_stats(self) -> dict:
+        """Reports the credential cache metrics.
+
+        Returns:
+            Dictionary of hits, misses, evictions and size (empty if the
+            cache is disabled).
+        """
+        if self.credential_cache is None:
+            return {}
+        return self.credential_cache.stats()
@@ -3,21 +3,26 @@
 Session Authentication Module
 """
 
-from typing import Dict
 from flask.globals import session
 from api.v1.auth.auth import Auth
+from api.v1.auth.session_store import session_store_from_env
 from models.user import User
 import uuid
 
+
 class SessionAuth(Auth):
     """
     Session Authentication Class.
 
     This class inherits from the Auth class and provides methods
     for managing user sessions through session IDs.
+
+    The sessions of all instances are kept in one session store, safe to
+    use from concurrent request threads: a SessionRegistry in memory, or
+    a store shared by the worker processes (see SESSION_STORE).
     """
 
-    user_id_by_session_id: Dict[str, str] = {}
+    user_id_by_session_id = session_store_from_env()
 
     def create_session(self, user_id: str = None) -> str:
         """
@@ -34,9 +39,23 @@ class SessionAuth(Auth):
         if user_id is None or not isinstance(user_id, str):
             return None
         session_id = str(uuid.uuid4())
-        self.user_id_by_session_id[session_id] = user_id
+        while not self.user_id_by_session_id.add(
+                session_id, self._session_value(user_id)):
+            session_id = str(uuid.uuid4())
         return session_id
 
+    def _session_value(self, user_id: str):
+        """
+        Value stored in the registry for a new session.
+
+        Args:
+            user_id (str): The ID of the user.
+
+        Returns:
+            str: The user ID.
+        """
+        return user_id
+
     def user_id_for_session_id(self, session_id: str = None) -> str:
         """
         Get User ID for Session ID.
@@ -87,5 +106,5 @@ class SessionAuth(Auth):
             return False
         if not self.user_id_for_session_id(cookie_data):
             return False
-        del self.user_id_by_session_id[cookie_data]
-        return True
+        # another thread may have destroyed it since the check
+        return self.user_id_by_session_id.pop(cookie_data) is not None
@@ -3,52 +3,265 @@
 Definition of SessionDBAuth class
 """
 
+import atexit
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
 from .session_exp_auth import SessionExpAuth
 from models.user_session import UserSession
 
+logger = logging.getLogger(__name__)
+
+
 class SessionDBAuth(SessionExpAuth):
     """
     SessionDBAuth Class.
 
     This class extends SessionExpAuth and implements session
     management with database persistence.
+
+    Sliding sessions are touched by setting their updated_at. The touches
+    are coalesced in memory and saved in one write by a background thread
+    every SESSION_TOUCH_FLUSH_INTERVAL seconds (60 by default, 0 to
+    disable), independently of the sweeper, as well as per
+    SESSION_TOUCH_BATCH (1000 by default) pending touches and at exit;
+    a touch lost in a crash only shortens the session.
     """
 
+    def __init__(self):
+        """
+        Initialize the SessionDBAuth class.
+
+        Loads the persisted sessions; the session_id index of UserSession
+        is rebuilt with them, and the expiration heap is filled with them
+        (the sweeper starts right away if there are any).
+        """
+        try:
+            touch_batch = int(os.getenv('SESSION_TOUCH_BATCH', 1000))
+        except ValueError:
+            touch_batch = 1000
+        self.touch_batch = touch_batch
+        try:
+            touch_flush_interval = float(
+                os.getenv('SESSION_TOUCH_FLUSH_INTERVAL', 60))
+        except ValueError:
+            touch_flush_interval = 60
+        self.touch_flush_interval = touch_flush_interval
+        self._touches = {}
+        self._touch_lock = threading.Lock()
+        self._touch_flusher = None
+        UserSession.load_from_file()
+        super().__init__()
+        if self.session_sliding:
+            atexit.register(self.flush_touches)
+
+    def _stored_sessions(self):
+        """
+        Persisted sessions.
+
+        Returns:
+            list: (session_id, UserSession) pairs.
+        """
+        return [(user_session.session_id, user_session)
+                for user_session in UserSession.all()]
+
+    def _now(self) -> datetime:
+        """
+        Current time, in the time base of the UserSession creation dates.
+
+        Returns:
+            datetime: The current UTC time.
+        """
+        return datetime.utcnow()
+
     def create_session(self, user_id=None):
         """
         Create a Session ID for a given user ID and persist it in the database.
 
+        The session is only stored as a UserSession, not in the in-memory
+        dictionary of SessionAuth.
+
         Args:
             user_id (str): The ID of the user.
 
         Returns:
             str: The generated session ID, or None if creation fails.
         """
-        session_id = super().create_session(user_id)
-        if not session_id:
+        if user_id is None or not isinstance(user_id, str):
             return None
+        session_id = str(uuid.uuid4())
         kw = {
             "user_id": user_id,
             "session_id": session_id
         }
         user = UserSession(**kw)
         user.save()
+        self._schedule_expiry(session_id, user.created_at)
         return session_id
 
+    def _last_active(self, user_session):
+        """
+        Date the lifetime of a persisted session runs from.
+
+        Args:
+            user_session (UserSession): The session.
+
+        Returns:
+            datetime: The last touch date (pending or saved) of a sliding
+                      session, the creation date otherwise.
+        """
+        if not self.session_sliding:
+            return user_session.created_at
+        touched_at = self._touches.get(user_session.session_id)
+        if touched_at is not None:
+            return touched_at
+        return user_session.updated_at
+
+    def _touch(self, session_id, user_session, now):
+        """
+        Extend a sliding session; the write is deferred to flush_touches.
+
+        Args:
+            session_id (str): The session ID.
+            user_session (UserSession): The session.
+            now (datetime): The current time.
+        """
+        with self._touch_lock:
+            self._touches[session_id] = now
+            full = len(self._touches) >= self.touch_batch
+            self._start_touch_flusher()
+        self._schedule_expiry(session_id, now)
+        if full:
+            self.flush_touches()
+
+    def _start_touch_flusher(self):
+        """
+        Start the background touch flusher, unless it runs or is disabled.
+
+        The caller holds the touch lock.
+        """
+        if self._touch_flusher is None and self.touch_flush_interval > 0:
+            self._touch_flusher = threading.Thread(
+                target=self._touch_flush_loop, daemon=True)
+            self._touch_flusher.start()
+
+    def _touch_flush_loop(self):
+        """
+        Background touch flusher: save the pending touches periodically.
+
+        A failed flush is logged and retried at the next interval; the
+        thread never stops.
+        """
+        while True:
+            time.sleep(self.touch_flush_interval)
+            try:
+                self.flush_touches()
+            except Exception:
+                logger.exception("Session touch flush failed")
+
+    def flush_touches(self):
+        """
+        Save the pending touches in one write.
+
+        If the write fails, the touches are pending again (unless a later
+        touch replaced them) and the error is raised.
+
+        Returns:
+            int: The number of sessions saved.
+        """
+        with self._touch_lock:
+            touches, self._touches = self._touches, {}
+        try:
+            user_sessions = []
+            for session_id, touched_at in touches.items():
+                for user_session in UserSession.search(
+                        {"session_id": session_id}):
+                    user_session.updated_at = touched_at
+                    user_sessions.append(user_session)
+            if user_sessions:
+                UserSession.save_many(user_sessions)
+        except Exception:
+            with self._touch_lock:
+                self._touches = dict(touches, **self._touches)
+            raise
+        return len(user_sessions)
+
+    def _session_expiries(self, session_ids):
+        """
+        Current expiration dates of persisted sessions.
+
+        Args:
+            session_ids (list): The session IDs.
+
+        Returns:
+            dict: The expiration dates of the stored sessions, by session ID.
+        """
+        duration = timedelta(seconds=self.session_duration)
+        expiries = {}
+        for session_id in session_ids:
+            for user_session in UserSession.search(
+                    {"session_id": session_id}):
+                expiries[session_id] = \
+                    self._last_active(user_session) + duration
+        return expiries
+
+    def _drop_sessions(self, session_ids):
+        """
+        Delete expired sessions from the database, in one write.
+
+        Args:
+            session_ids (list): The session IDs to delete.
+        """
+        user_sessions = []
+        for session_id in session_ids:
+            self._touches.pop(session_id, None)
+            user_sessions.extend(
+                UserSession.search({"session_id": session_id}))
+        UserSession.remove_many(user_sessions)
+
+    def session_count(self):
+        """
+        Number of persisted sessions, expired or not.
+
+        Returns:
+            int: The number of sessions.
+        """
+        return UserSession.count()
+
     def user_id_for_session_id(self, session_id=None):
         """
         Retrieve the user ID associated with a given session ID from the database.
 
+        The lookup goes through the session_id index of UserSession
+        (constant time, whatever the number of sessions).
+
         Args:
             session_id (str): The session ID to look up.
 
         Returns:
-            str: The user ID associated with the session ID, or None if not found.
+            str: The user ID associated with the session ID, or None if not found
+                 or expired.
         """
-        user_id = UserSession.search({"session_id": session_id})
-        if user_id:
-            return user_id
-        return None
+        if session_id is None:
+            return None
+        user_sessions = UserSession.search({"session_id": session_id})
+        if not user_sessions:
+            return None
+        user_session = user_sessions[0]
+        if self.session_duration > 0:
+            now = self._now()
+            last_active = self._last_active(user_session)
+            allowed_window = last_active + \
+                timedelta(seconds=self.session_duration)
+            if allowed_window < now:
+                return None
+            if self.session_sliding and \
+                    now - last_active >= self.touch_interval:
+                self._touch(session_id, user_session, now)
+        return user_session.user_id
 
     def destroy_session(self, request=None):
         """
@@ -67,6 +280,7 @@ class SessionDBAuth(SessionExpAuth):
             return False
         user_session = UserSession.search({"session_id": session_id})
         if user_session:
+            self._touches.pop(session_id, None)
             user_session[0].remove()
             return True
         return False
@@ -3,15 +3,33 @@
 Define SessionExpAuth class
 """
 
+import heapq
+import logging
 import os
+import threading
+import time
 from datetime import datetime, timedelta
 from .session_auth import SessionAuth
 
+logger = logging.getLogger(__name__)
+
+
 class SessionExpAuth(SessionAuth):
     """
     SessionExpAuth Class.
 
     This class extends SessionAuth and adds an expiration date to a session ID.
+
+    Sessions are also kept in a min-heap ordered by expiration date, from
+    which a background thread evicts the expired ones every
+    SESSION_SWEEP_INTERVAL seconds (60 by default, 0 to disable). The heap
+    starts with the sessions already stored (a SESSION_STORE=sqlite store
+    outlives the process).
+
+    With SESSION_SLIDING=1, the lifetime runs from the last authenticated
+    request instead of the creation date (idle timeout). A session is
+    touched at most once every SESSION_TOUCH_INTERVAL seconds (60 by
+    default, at most half the duration), so most requests skip the touch.
     """
 
     def __init__(self):
@@ -25,6 +43,249 @@ class SessionExpAuth(SessionAuth):
         except Exception:
             duration = 0
         self.session_duration = duration
+        try:
+            sweep_interval = float(os.getenv('SESSION_SWEEP_INTERVAL', 60))
+        except ValueError:
+            sweep_interval = 60
+        self.sweep_interval = sweep_interval
+        self.session_sliding = os.getenv('SESSION_SLIDING') == '1'
+        try:
+            touch_interval = float(os.getenv('SESSION_TOUCH_INTERVAL', 60))
+        except ValueError:
+            touch_interval = 60
+        self.touch_interval = timedelta(
+            seconds=min(touch_interval, max(duration, 0) / 2))
+        self.swept_sessions = 0
+        self._expiry_heap = []
+        self._expiry_lock = threading.Lock()
+        self._sweeper = None
+        if duration > 0:
+            self._load_expiries()
+
+    def _now(self) -> datetime:
+        """
+        Current time, in the time base of the session creation dates.
+
+        Returns:
+            datetime: The current local time.
+        """
+        return datetime.now()
+
+    def _schedule_expiry(self, session_id, active_at):
+        """
+        Register a session in the expiration heap and start the sweeper.
+
+        Args:
+            session_id (str): The session ID.
+            active_at (datetime): The creation (or last touch) date of the
+                                  session.
+        """
+        if self.session_duration <= 0:
+            return
+        expires_at = active_at + timedelta(seconds=self.session_duration)
+        with self._expiry_lock:
+            heapq.heappush(self._expiry_heap, (expires_at, session_id))
+            self._start_sweeper()
+
+    def _stored_sessions(self):
+        """
+        Sessions already in the store, such as the ones a shared store kept
+        across restarts.
+
+        Returns:
+            list: (session_id, session dictionary) pairs.
+        """
+        return [(session_id, user_details) for session_id, user_details
+                in self.user_id_by_session_id.items()
+                if isinstance(user_details, dict)
+                and "created_at" in user_details]
+
+    def _load_expiries(self):
+        """
+        Fill the expiration heap with the stored sessions, and start the
+        sweeper if there are any.
+        """
+        duration = timedelta(seconds=self.session_duration)
+        heap = [(self._last_active(stored) + duration, session_id)
+                for session_id, stored in self._stored_sessions()]
+        heapq.heapify(heap)
+        with self._expiry_lock:
+            self._expiry_heap = heap
+            if heap:
+                self._start_sweeper()
+
+    def _start_sweeper(self):
+        """
+        Start the background sweeper, unless it runs or is disabled.
+
+        The caller holds the expiration heap lock.
+        """
+        if self._sweeper is None and self.sweep_interval > 0:
+            self._sweeper = threading.Thread(target=self._sweep_loop,
+                                             daemon=True)
+            self._sweeper.start()
+
+    def _sweep_loop(self):
+        """
+        Background sweeper: evict the expired sessions periodically.
+
+        A failed pass (a locked database, an I/O error) is logged and
+        retried at the next interval; the thread never stops.
+        """
+        while True:
+            time.sleep(self.sweep_interval)
+            try:
+                self.sweep_expired()
+            except Exception:
+                logger.exception("Session sweep failed")
+
+    def _last_active(self, user_details):
+        """
+        Date the lifetime of a session runs from.
+
+        Args:
+            user_details (dict): The session dictionary.
+
+        Returns:
+            datetime: The last touch date, or the creation date.
+        """
+        return user_details.get("touched_at", user_details["created_at"])
+
+    def _touch(self, session_id, user_details, now):
+        """
+        Extend a sliding session, unless it was destroyed meanwhile.
+
+        Args:
+            session_id (str): The session ID.
+            user_details (dict): The session dictionary.
+            now (datetime): The current time.
+        """
+        user_details = dict(user_details, touched_at=now)
+        if self.user_id_by_session_id.replace(session_id, user_details):
+            self._schedule_expiry(session_id, now)
+
+    def flush_touches(self):
+        """
+        Persist the pending session touches (nothing to persist here: the
+        sessions only live in memory).
+        """
+
+    def _session_expiries(self, session_ids):
+        """
+        Current expiration dates of sessions, read in one batch.
+
+        Args:
+            session_ids (list): The session IDs.
+
+        Returns:
+            dict: The expiration dates of the stored sessions, by session ID.
+        """
+        duration = timedelta(seconds=self.session_duration)
+        return {session_id: self._last_active(user_details) + duration
+                for session_id, user_details in
+                self.user_id_by_session_id.get_many(session_ids).items()
+                if isinstance(user_details, dict)
+                and "created_at" in user_details}
+
+    def _drop_sessions(self, session_ids):
+        """
+        Delete expired sessions, in one batch.
+
+        Args:
+            session_ids (list): The session IDs to delete.
+        """
+        self.user_id_by_session_id.pop_many(session_ids)
+
+    def _expired_entries(self, now):
+        """
+        Heap entries whose expiration date has passed, without popping them.
+
+        Only visits the expired entries and their direct children.
+
+        Args:
+            now (datetime): The current time.
+
+        Returns:
+            list: The (expires_at, session_id) expired entries.
+        """
+        heap = self._expiry_heap
+        entries = []
+        stack = [0]
+        while stack:
+            i = stack.pop()
+            if i < len(heap) and heap[i][0] <= now:
+                entries.append(heap[i])
+                stack.extend((2 * i + 1, 2 * i + 2))
+        return entries
+
+    def _still_expired(self, entries, now):
+        """
+        Sessions of expired heap entries that are still stored and expired.
+
+        Args:
+            entries (list): (expires_at, session_id) heap entries.
+            now (datetime): The current time.
+
+        Returns:
+            list: The distinct session IDs.
+        """
+        expiries = self._session_expiries(
+            list(dict.fromkeys(entry[1] for entry in entries)))
+        return [session_id for session_id, expires_at in expiries.items()
+                if expires_at <= now]
+
+    def sweep_expired(self):
+        """
+        Evict every expired session, persisting the deletes in one batch.
+
+        Heap entries of sessions already destroyed, or whose expiration date
+        was pushed back (they have a later entry), are discarded. If the
+        store fails, the popped entries go back in the heap for the next
+        sweep.
+
+        Returns:
+            int: The number of sessions evicted.
+        """
+        now = self._now()
+        entries = []
+        with self._expiry_lock:
+            while self._expiry_heap and self._expiry_heap[0][0] <= now:
+                entries.append(heapq.heappop(self._expiry_heap))
+        try:
+            expired = self._still_expired(entries, now)
+            if expired:
+                self._drop_sessions(expired)
+        except Exception:
+            with self._expiry_lock:
+                for entry in entries:
+                    heapq.heappush(self._expiry_heap, entry)
+            raise
+        self.swept_sessions += len(expired)
+        return len(expired)
+
+    def session_count(self):
+        """
+        Number of stored sessions, expired or not.
+
+        Returns:
+            int: The number of sessions.
+        """
+        return len(self.user_id_by_session_id)
+
+    def session_stats(self):
+        """
+        Session gauges.
+
+        Returns:
+            dict: Live sessions, expired sessions not swept yet and sessions
+                  swept so far.
+        """
+        now = self._now()
+        with self._expiry_lock:
+            entries = self._expired_entries(now)
+        expired = len(self._still_expired(entries, now))
+        return {"live": self.session_count() - expired, "expired": expired,
+                "swept": self.swept_sessions}
 
     def create_session(self, user_id=None):
         """
@@ -39,12 +300,26 @@ class SessionExpAuth(SessionAuth):
         session_id = super().create_session(user_id)
         if session_id is None:
             return None
-        session_dictionary = {
+        session_dictionary = self.user_id_by_session_id.get(session_id)
+        if session_dictionary is not None:
+            self._schedule_expiry(session_id,
+                                  session_dictionary["created_at"])
+        return session_id
+
+    def _session_value(self, user_id):
+        """
+        Value stored in the registry for a new session.
+
+        Args:
+            user_id (str): The ID of the user.
+
+        Returns:
+            dict: The user ID and the creation date of the session.
+        """
+        return {
             "user_id": user_id,
-            "created_at": datetime.now()
+            "created_at": self._now()
         }
-        self.user_id_by_session_id[session_id] = session_dictionary
-        return session_id
 
     def user_id_for_session_id(self, session_id=None):
         """
@@ -66,8 +341,11 @@ class SessionExpAuth(SessionAuth):
             return None
         if self.session_duration <= 0:
             return user_details.get("user_id")
-        created_at = user_details.get("created_at")
-        allowed_window = created_at + timedelta(seconds=self.session_duration)
-        if allowed_window < datetime.now():
+        now = self._now()
+        last_active = self._last_active(user_details)
+        allowed_window = last_active + timedelta(seconds=self.session_duration)
+        if allowed_window < now:
             return None
+        if self.session_sliding and now - last_active >= self.touch_interval:
+            self._touch(session_id, user_details, now)
         return user_details.get("user_id")
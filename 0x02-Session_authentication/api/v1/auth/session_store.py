@@ -0,0 +1,630 @@
+#!/usr/bin/env python3
+"""
+Session Store Module
+
+Stores of the session IDs of SessionAuth and SessionExpAuth, selected by
+the SESSION_STORE environment variable: "memory" (default, private to the
+process) or "sqlite" (database file SESSION_STORE_PATH, shared by all the
+workers of a host).
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+from models.serializer import dumps, loads
+
+_MISSING = object()
+
+
+class SessionStore:
+    """
+    Session Store Class.
+
+    Mapping of session IDs to session values (a user ID, or a dict of a
+    user ID and datetimes). Every operation is atomic; the *_many ones
+    are done in one round trip by the stores that can.
+    """
+
+    def get(self, session_id, default=None):
+        """
+        Value of a session ID.
+
+        Args:
+            session_id (str): The session ID.
+            default: Returned if there is no such session.
+
+        Returns:
+            The value of the session, or default.
+        """
+        raise NotImplementedError
+
+    def add(self, session_id, value) -> bool:
+        """
+        Store a new session, unless the session ID is already taken.
+
+        Args:
+            session_id (str): The session ID.
+            value: The value of the session.
+
+        Returns:
+            bool: True if the session was stored.
+        """
+        raise NotImplementedError
+
+    def pop(self, session_id, default=None):
+        """
+        Remove a session and return its value.
+
+        Args:
+            session_id (str): The session ID.
+            default: Returned if there is no such session.
+
+        Returns:
+            The value of the session, or default.
+        """
+        raise NotImplementedError
+
+    def replace(self, session_id, value) -> bool:
+        """
+        Replace the value of a session, unless it was removed.
+
+        Args:
+            session_id (str): The session ID.
+            value: The new value of the session.
+
+        Returns:
+            bool: True if the session was stored and got the new value.
+        """
+        raise NotImplementedError
+
+    def items(self) -> list:
+        """
+        Every stored session.
+
+        Returns:
+            list: The (session ID, value) pairs.
+        """
+        raise NotImplementedError
+
+    def clear(self):
+        """
+        Remove every session.
+        """
+        raise NotImplementedError
+
+    def get_many(self, session_ids) -> dict:
+        """
+        Values of several session IDs.
+
+        Args:
+            session_ids (list): The session IDs.
+
+        Returns:
+            dict: The values of the stored sessions, by session ID.
+        """
+        values = {}
+        for session_id in session_ids:
+            value = self.get(session_id, _MISSING)
+            if value is not _MISSING:
+                values[session_id] = value
+        return values
+
+    def set_many(self, values: dict):
+        """
+        Store or replace several sessions.
+
+        Args:
+            values (dict): The values of the sessions, by session ID.
+        """
+        for session_id, value in values.items():
+            self[session_id] = value
+
+    def pop_many(self, session_ids) -> dict:
+        """
+        Remove several sessions.
+
+        Args:
+            session_ids (list): The session IDs.
+
+        Returns:
+            dict: The values of the removed sessions, by session ID.
+        """
+        values = {}
+        for session_id in session_ids:
+            value = self.pop(session_id, _MISSING)
+            if value is not _MISSING:
+                values[session_id] = value
+        return values
+
+    def __getitem__(self, session_id):
+        """
+        Value of a session ID, KeyError if there is no such session.
+        """
+        value = self.get(session_id, _MISSING)
+        if value is _MISSING:
+            raise KeyError(session_id)
+        return value
+
+    def __setitem__(self, session_id, value):
+        """
+        Store or replace a session.
+        """
+        raise NotImplementedError
+
+    def __delitem__(self, session_id):
+        """
+        Remove a session, KeyError if there is no such session.
+        """
+        if self.pop(session_id, _MISSING) is _MISSING:
+            raise KeyError(session_id)
+
+    def __contains__(self, session_id) -> bool:
+        """
+        True if the session ID is stored.
+        """
+        return self.get(session_id, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        """
+        Number of sessions.
+        """
+        raise NotImplementedError
+
+
+class SessionRegistry(SessionStore):
+    """
+    Session Registry Class.
+
+    Thread-safe mapping of session IDs, split in shards picked by the hash
+    of the session ID, each with its own lock: writers of different shards
+    never wait for each other. A lookup is a single dict read, atomic
+    without the lock.
+    """
+
+    def __init__(self, shards: int = 16):
+        """
+        Initialize an empty registry.
+
+        Args:
+            shards (int): Number of shards, rounded up to a power of two.
+        """
+        count = 1
+        while count < shards:
+            count *= 2
+        self._mask = count - 1
+        self._shards = [{} for _ in range(count)]
+        self._locks = [threading.Lock() for _ in range(count)]
+
+    def _shard(self, session_id):
+        """
+        Index of the shard of a session ID.
+
+        Args:
+            session_id (str): The session ID.
+
+        Returns:
+            int: The shard index.
+        """
+        return hash(session_id) & self._mask
+
+    def get(self, session_id, default=None):
+        """
+        Value of a session ID.
+
+        Args:
+            session_id (str): The session ID.
+            default: Returned if there is no such session.
+
+        Returns:
+            The value of the session, or default.
+        """
+        return self._shards[hash(session_id) & self._mask].get(
+            session_id, default)
+
+    def add(self, session_id, value) -> bool:
+        """
+        Store a new session, unless the session ID is already taken.
+
+        Args:
+            session_id (str): The session ID.
+            value: The value of the session.
+
+        Returns:
+            bool: True if the session was stored.
+        """
+        i = self._shard(session_id)
+        with self._locks[i]:
+            if session_id in self._shards[i]:
+                return False
+            self._shards[i][session_id] = value
+            return True
+
+    def pop(self, session_id, default=None):
+        """
+        Remove a session and return its value.
+
+        Args:
+            session_id (str): The session ID.
+            default: Returned if there is no such session.
+
+        Returns:
+            The value of the session, or default.
+        """
+        i = self._shard(session_id)
+        with self._locks[i]:
+            return self._shards[i].pop(session_id, default)
+
+    def replace(self, session_id, value) -> bool:
+        """
+        Replace the value of a session, unless it was removed.
+
+        Args:
+            session_id (str): The session ID.
+            value: The new value of the session.
+
+        Returns:
+            bool: True if the session was stored and got the new value.
+        """
+        i = self._shard(session_id)
+        with self._locks[i]:
+            if session_id not in self._shards[i]:
+                return False
+            self._shards[i][session_id] = value
+            return True
+
+    def items(self) -> list:
+        """
+        Every stored session, each shard read under its lock.
+
+        Returns:
+            list: The (session ID, value) pairs.
+        """
+        pairs = []
+        for shard, lock in zip(self._shards, self._locks):
+            with lock:
+                pairs.extend(shard.items())
+        return pairs
+
+    def clear(self):
+        """
+        Remove every session.
+        """
+        for shard, lock in zip(self._shards, self._locks):
+            with lock:
+                shard.clear()
+
+    def __getitem__(self, session_id):
+        """
+        Value of a session ID, KeyError if there is no such session.
+        """
+        return self._shards[self._shard(session_id)][session_id]
+
+    def __setitem__(self, session_id, value):
+        """
+        Store or replace a session.
+        """
+        i = self._shard(session_id)
+        with self._locks[i]:
+            self._shards[i][session_id] = value
+
+    def __delitem__(self, session_id):
+        """
+        Remove a session, KeyError if there is no such session.
+        """
+        i = self._shard(session_id)
+        with self._locks[i]:
+            del self._shards[i][session_id]
+
+    def __contains__(self, session_id) -> bool:
+        """
+        True if the session ID is stored.
+        """
+        return session_id in self._shards[self._shard(session_id)]
+
+    def __len__(self) -> int:
+        """
+        Number of sessions.
+        """
+        return sum(len(shard) for shard in self._shards)
+
+
+def _encode(value) -> str:
+    """
+    JSON text of a session value, datetimes tagged to be restored.
+
+    Args:
+        value: A user ID, or a dict of a user ID and datetimes.
+
+    Returns:
+        str: The JSON text.
+    """
+    if isinstance(value, dict):
+        value = {key: {"$datetime": item.isoformat()}
+                 if isinstance(item, datetime) else item
+                 for key, item in value.items()}
+    return dumps(value)
+
+
+def _decode(text):
+    """
+    Session value of a JSON text built by _encode.
+
+    Args:
+        text (str): The JSON text.
+
+    Returns:
+        The session value.
+    """
+    value = loads(text)
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if isinstance(item, dict) and "$datetime" in item:
+                value[key] = datetime.fromisoformat(item["$datetime"])
+    return value
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    SQLite Session Store Class.
+
+    One "sessions" table in a database file in WAL mode, so every worker
+    process opening the file sees the same sessions. Connections are kept
+    in a pool of at most pool_size idle connections, shared by the
+    request threads. The *_many operations run in one transaction, by
+    chunks of BATCH session IDs.
+    """
+
+    # Session IDs per statement of the *_many operations
+    BATCH = 500
+
+    def __init__(self, db_path: str = ".sessions.sqlite3",
+                 pool_size: int = 8):
+        """
+        Initialize the store on the database file db_path.
+
+        Args:
+            db_path (str): Path of the database file.
+            pool_size (int): Maximum number of idle pooled connections.
+        """
+        self.db_path = db_path
+        self.pool_size = pool_size
+        self._pool = queue.LifoQueue()
+        with self._connection() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS sessions "
+                         "(id TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+    @contextmanager
+    def _connection(self):
+        """
+        Borrow a pooled connection (a new one if none is idle).
+
+        Yields:
+            sqlite3.Connection: The connection, in autocommit mode.
+        """
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = sqlite3.connect(self.db_path, timeout=30,
+                                   isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            if self._pool.qsize() < self.pool_size:
+                self._pool.put(conn)
+            else:
+                conn.close()
+
+    @staticmethod
+    def _chunks(session_ids):
+        """
+        Split session IDs in chunks of BATCH.
+
+        Args:
+            session_ids (list): The session IDs.
+
+        Returns:
+            list: The chunks.
+        """
+        session_ids = list(session_ids)
+        return [session_ids[i:i + SQLiteSessionStore.BATCH]
+                for i in range(0, len(session_ids), SQLiteSessionStore.BATCH)]
+
+    @staticmethod
+    def _select(conn, chunk) -> dict:
+        """
+        Values of a chunk of session IDs.
+
+        Args:
+            conn (sqlite3.Connection): The connection.
+            chunk (list): The session IDs.
+
+        Returns:
+            dict: The values of the stored sessions, by session ID.
+        """
+        rows = conn.execute(
+            "SELECT id, value FROM sessions WHERE id IN ({})".format(
+                ", ".join("?" * len(chunk))), chunk)
+        return {session_id: _decode(text) for session_id, text in rows}
+
+    def get(self, session_id, default=None):
+        """
+        Value of a session ID.
+
+        Args:
+            session_id (str): The session ID.
+            default: Returned if there is no such session.
+
+        Returns:
+            The value of the session, or default.
+        """
+        with self._connection() as conn:
+            row = conn.execute("SELECT value FROM sessions WHERE id = ?",
+                               (session_id,)).fetchone()
+        return default if row is None else _decode(row[0])
+
+    def add(self, session_id, value) -> bool:
+        """
+        Store a new session, unless the session ID is already taken.
+
+        Args:
+            session_id (str): The session ID.
+            value: The value of the session.
+
+        Returns:
+            bool: True if the session was stored.
+        """
+        with self._connection() as conn:
+            cursor = conn.execute("INSERT OR IGNORE INTO sessions "
+                                  "(id, value) VALUES (?, ?)",
+                                  (session_id, _encode(value)))
+        return cursor.rowcount == 1
+
+    def pop(self, session_id, default=None):
+        """
+        Remove a session and return its value.
+
+        Args:
+            session_id (str): The session ID.
+            default: Returned if there is no such session.
+
+        Returns:
+            The value of the session, or default.
+        """
+        return self.pop_many([session_id]).get(session_id, default)
+
+    def replace(self, session_id, value) -> bool:
+        """
+        Replace the value of a session, unless it was removed.
+
+        Args:
+            session_id (str): The session ID.
+            value: The new value of the session.
+
+        Returns:
+            bool: True if the session was stored and got the new value.
+        """
+        with self._connection() as conn:
+            cursor = conn.execute("UPDATE sessions SET value = ? "
+                                  "WHERE id = ?",
+                                  (_encode(value), session_id))
+        return cursor.rowcount == 1
+
+    def items(self) -> list:
+        """
+        Every stored session.
+
+        Returns:
+            list: The (session ID, value) pairs.
+        """
+        with self._connection() as conn:
+            rows = conn.execute("SELECT id, value FROM sessions").fetchall()
+        return [(session_id, _decode(text)) for session_id, text in rows]
+
+    def clear(self):
+        """
+        Remove every session.
+        """
+        with self._connection() as conn:
+            conn.execute("DELETE FROM sessions")
+
+    def get_many(self, session_ids) -> dict:
+        """
+        Values of several session IDs, one query per BATCH IDs.
+
+        Args:
+            session_ids (list): The session IDs.
+
+        Returns:
+            dict: The values of the stored sessions, by session ID.
+        """
+        values = {}
+        with self._connection() as conn:
+            for chunk in self._chunks(session_ids):
+                values.update(self._select(conn, chunk))
+        return values
+
+    def set_many(self, values: dict):
+        """
+        Store or replace several sessions in one transaction.
+
+        Args:
+            values (dict): The values of the sessions, by session ID.
+        """
+        with self._connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany("INSERT OR REPLACE INTO sessions (id, value) "
+                             "VALUES (?, ?)",
+                             [(session_id, _encode(value))
+                              for session_id, value in values.items()])
+            conn.execute("COMMIT")
+
+    def pop_many(self, session_ids) -> dict:
+        """
+        Remove several sessions in one transaction.
+
+        Args:
+            session_ids (list): The session IDs.
+
+        Returns:
+            dict: The values of the removed sessions, by session ID.
+        """
+        values = {}
+        with self._connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for chunk in self._chunks(session_ids):
+                values.update(self._select(conn, chunk))
+                conn.execute("DELETE FROM sessions WHERE id IN ({})".format(
+                    ", ".join("?" * len(chunk))), chunk)
+            conn.execute("COMMIT")
+        return values
+
+    def __setitem__(self, session_id, value):
+        """
+        Store or replace a session.
+        """
+        with self._connection() as conn:
+            conn.execute("INSERT OR REPLACE INTO sessions (id, value) "
+                         "VALUES (?, ?)", (session_id, _encode(value)))
+
+    def __len__(self) -> int:
+        """
+        Number of sessions.
+        """
+        with self._connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+def session_store_from_env() -> SessionStore:
+    """
+    Session store selected by the SESSION_STORE environment variable.
+
+    Returns:
+        SessionStore: A SessionRegistry of SESSION_SHARDS shards for
+                      "memory" (default), a SQLiteSessionStore on
+                      SESSION_STORE_PATH with SESSION_STORE_POOL pooled
+                      connections for "sqlite".
+    """
+    store_type = os.getenv('SESSION_STORE', 'memory')
+    if store_type == 'sqlite':
+        try:
+            pool_size = int(os.getenv('SESSION_STORE_POOL', 8))
+        except ValueError:
+            pool_size = 8
+        return SQLiteSessionStore(
+            os.getenv('SESSION_STORE_PATH', '.sessions.sqlite3'), pool_size)
+    if store_type != 'memory':
+        raise ValueError("Unknown SESSION_STORE {}".format(store_type))
+    try:
+        shards = max(1, int(os.getenv('SESSION_SHARDS', 16)))
+    except ValueError:
+        shards = 16
+    return SessionRegistry(shards)
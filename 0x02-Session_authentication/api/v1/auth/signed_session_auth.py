@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Definition of SignedSessionAuth class
+"""
+
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from .session_auth import SessionAuth
+
+# Lifetime of a token when SESSION_DURATION is not set (one day)
+DEFAULT_DURATION = 86400
+
+
+def _b64encode(data: bytes) -> str:
+    """
+    Unpadded URL-safe base64 encoding.
+
+    Args:
+        data (bytes): The bytes to encode.
+
+    Returns:
+        str: The encoded string.
+    """
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+class SignedSessionAuth(SessionAuth):
+    """
+    SignedSessionAuth Class.
+
+    Stateless sessions: the session ID is a token
+    "<user_id>.<expires_at>.<nonce>.<signature>", signed with
+    HMAC-SHA256 and the SESSION_SECRET key. Verifying a token needs no
+    lookup, so any instance sharing the key accepts it. Without
+    SESSION_SECRET a random key is drawn, valid for this process only.
+
+    Tokens expire SESSION_DURATION seconds after their creation (one day
+    if not set). Logged out tokens are kept in an in-process revocation
+    set until they expire.
+    """
+
+    def __init__(self):
+        """
+        Initialize the SignedSessionAuth class.
+
+        Reads the signing key and the token lifetime from the environment.
+        """
+        secret = os.getenv('SESSION_SECRET')
+        if secret:
+            secret = secret.encode()
+        else:
+            secret = secrets.token_bytes(32)
+        self._mac = hmac.new(secret, digestmod=hashlib.sha256)
+        try:
+            duration = int(os.getenv('SESSION_DURATION'))
+        except Exception:
+            duration = 0
+        self.session_duration = duration if duration > 0 \
+            else DEFAULT_DURATION
+        self._revoked = {}
+        self._revoked_lock = threading.Lock()
+
+    def _signature(self, payload: str) -> str:
+        """
+        Signature of a token payload.
+
+        Args:
+            payload (str): "<user_id>.<expires_at>.<nonce>".
+
+        Returns:
+            str: The base64 encoded HMAC-SHA256 of the payload.
+        """
+        mac = self._mac.copy()
+        mac.update(payload.encode())
+        return _b64encode(mac.digest())
+
+    def _valid_signature(self, payload: str, signature: str) -> bool:
+        """
+        Constant time check of the signature of a token payload.
+
+        Args:
+            payload (str): "<user_id>.<expires_at>.<nonce>".
+            signature (str): The signature part of the token.
+
+        Returns:
+            bool: True if the signature matches the payload.
+        """
+        # compare_digest only takes ASCII str: compare the bytes instead
+        return hmac.compare_digest(self._signature(payload).encode(),
+                                   signature.encode('utf-8', 'replace'))
+
+    def create_session(self, user_id: str = None) -> str:
+        """
+        Create a signed session token for a given user ID.
+
+        Args:
+            user_id (str): The ID of the user.
+
+        Returns:
+            str: The token, or None if the user ID is invalid.
+        """
+        if user_id is None or not isinstance(user_id, str) \
+                or "." in user_id:
+            return None
+        expires_at = int(time.time()) + self.session_duration
+        payload = "{}.{}.{}".format(user_id, expires_at,
+                                    secrets.token_hex(8))
+        return "{}.{}".format(payload, self._signature(payload))
+
+    def _verify(self, session_id: str):
+        """
+        Check the signature and the expiration date of a token.
+
+        Args:
+            session_id (str): The token.
+
+        Returns:
+            tuple: (user_id, expires_at) of a valid token, or None.
+        """
+        if session_id is None or not isinstance(session_id, str):
+            return None
+        payload, _, signature = session_id.rpartition(".")
+        parts = payload.split(".")
+        if len(parts) != 3:
+            return None
+        if not self._valid_signature(payload, signature):
+            return None
+        try:
+            expires_at = int(parts[1])
+        except ValueError:
+            return None
+        if expires_at < time.time():
+            return None
+        return parts[0], expires_at
+
+    def user_id_for_session_id(self, session_id: str = None) -> str:
+        """
+        Retrieve the user ID of a valid, unexpired and not revoked token.
+
+        Args:
+            session_id (str): The token.
+
+        Returns:
+            str: The user ID, or None.
+        """
+        verified = self._verify(session_id)
+        if verified is None or session_id in self._revoked:
+            return None
+        return verified[0]
+
+    def destroy_session(self, request=None):
+        """
+        Revoke the token of a request cookie until it expires.
+
+        Args:
+            request: The Flask request object.
+
+        Returns:
+            bool: True if a valid token was revoked, False otherwise.
+        """
+        session_id = self.session_cookie(request)
+        verified = self._verify(session_id)
+        if verified is None:
+            return False
+        now = time.time()
+        with self._revoked_lock:
+            if session_id in self._revoked:
+                return False
+            # expired tokens fail verification anyway
+            self._revoked = {token: expires_at for token, expires_at
+                             in self._revoked.items() if expires_at >= now}
+            self._revoked[session_id] = verified[1]
+        return True
@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 """Module containing routes for handling API status and errors."""
-from flask import jsonify, abort
+from flask import abort, current_app, jsonify
 from api.v1.views import app_views
 
 
@@ -19,11 +19,18 @@ def stats() -> str:
     """Endpoint to retrieve statistics about objects.
 
     Returns:
-        JSON response containing statistics about the objects.
+        JSON response containing statistics about the objects (and the
+        credential cache metrics and session gauges of the authentication,
+        if it has any).
     """
     from models.user import User
+    auth = current_app.config.get('AUTH')
     stats = {}
     stats['users'] = User.count()
+    if hasattr(auth, 'cache_stats'):
+        stats['auth_cache'] = auth.cache_stats()
+    if hasattr(auth, 'session_stats'):
+        stats['sessions'] = auth.session_stats()
     return jsonify(stats)
 
 
@@ -1,19 +1,143 @@
 #!/usr/bin/env python3
 """ Module of Users views
 """
+from itertools import islice
+from typing import Iterable
 from api.v1.views import app_views
-from flask import abort, jsonify, request
+from flask import Response, abort, jsonify, request
+from models.serializer import dumps, parse_timestamp
+from models.storage import Prefix, Range
 from models.user import User
 
 
+# Items serialized per chunk of a streamed JSON response
+STREAM_BATCH = 100
+# Attributes filtered by ?<attr>= (equality) or ?<attr>_prefix=
+FILTER_ATTRIBUTES = ('email', 'first_name', 'last_name')
+# Timestamps filtered by ?<attr>_min= and/or ?<attr>_max= (included)
+RANGE_ATTRIBUTES = ('created_at', 'updated_at')
+
+
+def json_response(payload, status: int = 200) -> Response:
+    """ JSON response serialized with the models serializer backend
+    (same body as jsonify: sorted keys, trailing newline)
+    """
+    return Response(dumps(payload, sort_keys=True) + "\n", status=status,
+                    mimetype="application/json")
+
+
+def json_stream(items: Iterable, status: int = 200) -> Response:
+    """ Chunked JSON array response, same body as json_response(list):
+    items are consumed and serialized STREAM_BATCH at a time
+    """
+    def chunks():
+        opening = "["
+        batch = []
+        for item in items:
+            batch.append(dumps(item, sort_keys=True))
+            if len(batch) == STREAM_BATCH:
+                yield opening + ",".join(batch)
+                opening = ","
+                batch = []
+        if batch:
+            yield opening + ",".join(batch) + "]\n"
+        else:
+            yield ("[" if opening == "[" else "") + "]\n"
+    return Response(chunks(), status=status, mimetype="application/json")
+
+
+def user_json(user: User, fields: frozenset = None) -> dict:
+    """ JSON representation of a user, only fields if given
+    """
+    result = user.to_json()
+    if fields is None:
+        return result
+    return {k: v for k, v in result.items() if k in fields}
+
+
+def user_filters(args: dict) -> dict:
+    """ Search attributes of the filter query parameters
+    (ValueError if one of them is invalid)
+    """
+    filters = {}
+    for attr in FILTER_ATTRIBUTES:
+        if attr in args:
+            filters[attr] = args[attr]
+        if attr + '_prefix' in args:
+            if attr in filters:
+                raise ValueError("Conflicting {} filters".format(attr))
+            filters[attr] = Prefix(args[attr + '_prefix'])
+    for attr in RANGE_ATTRIBUTES:
+        low = args.get(attr + '_min')
+        high = args.get(attr + '_max')
+        if low is None and high is None:
+            continue
+        try:
+            filters[attr] = Range(
+                None if low is None else parse_timestamp(low),
+                None if high is None else parse_timestamp(high))
+        except ValueError:
+            raise ValueError("Invalid {} range".format(attr))
+    return filters
+
+
 @app_views.route('/users', methods=['GET'], strict_slashes=False)
 def view_all_users() -> str:
     """ GET /api/v1/users
+    Query parameters (optional):
+      - limit: number of users per page; the X-Next-Cursor header
+        holds the cursor of the next page, if any
+      - cursor: X-Next-Cursor of the previous page
+      - fields: comma-separated attributes to return
+      - stream: 1 for a chunked response
+      - email, first_name, last_name: exact value
+      - email_prefix, first_name_prefix, last_name_prefix: value prefix
+      - created_at_min, created_at_max, updated_at_min, updated_at_max:
+        timestamp range (%Y-%m-%dT%H:%M:%S, bounds included)
     Return:
-      - list of all User objects JSON represented
+      - list of User objects JSON represented
+      - 400 if a parameter is invalid
     """
-    all_users = [user.to_json() for user in User.all()]
-    return jsonify(all_users)
+    limit = request.args.get('limit')
+    if limit is not None:
+        limit = int(limit) if limit.isdecimal() else 0
+        if limit < 1:
+            return jsonify({'error': "Invalid limit"}), 400
+    fields = request.args.get('fields')
+    if fields is not None:
+        fields = frozenset(field for field in fields.split(',') if field)
+    try:
+        filters = user_filters(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    cursor = request.args.get('cursor')
+    if filters:
+        users = User.search(filters)
+        if cursor is not None:
+            ids = [user.id for user in users]
+            try:
+                users = users[ids.index(cursor) + 1:]
+            except ValueError:
+                return jsonify({'error': "Invalid cursor"}), 400
+    else:
+        try:
+            users = User.scan(cursor)
+        except KeyError:
+            return jsonify({'error': "Invalid cursor"}), 400
+    next_cursor = None
+    if limit is not None:
+        users = list(islice(users, limit + 1))
+        if len(users) > limit:
+            users = users[:limit]
+            next_cursor = users[-1].id
+    items = (user_json(user, fields) for user in users)
+    if request.args.get('stream') == "1":
+        response = json_stream(items)
+    else:
+        response = json_response(list(items))
+    if next_cursor is not None:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
 
 
 @app_views.route('/users/<user_id>', methods=['GET'], strict_slashes=False)
@@ -30,7 +154,7 @@ def view_one_user(user_id: str = None) -> str:
     user = User.get(user_id)
     if user is None:
         abort(404)
-    return jsonify(user.to_json())
+    return json_response(user.to_json())
 
 
 @app_views.route('/users/<user_id>', methods=['DELETE'], strict_slashes=False)
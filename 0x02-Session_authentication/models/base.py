@@ -2,38 +2,82 @@
 """ Base module
 """
 from datetime import datetime
-from typing import TypeVar, List, Iterable
-from os import path
-import json
+from typing import TypeVar, List, Iterable, Iterator
+from os import getenv
 import uuid
 
+from models.file_storage import FileStorage
+from models.serializer import (TIMESTAMP_FORMAT, format_timestamp,
+                               parse_timestamp)
+from models.storage import Storage
 
-TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
-DATA = {}
+
+SLOT_NAMES = {}
+_UNSET = object()
+
+
+def _slot_names(cls) -> tuple:
+    """ Names of the __slots__ attributes of a class, base class first
+    """
+    names = SLOT_NAMES.get(cls)
+    if names is None:
+        names = tuple(name for klass in reversed(cls.__mro__)
+                      for name in klass.__dict__.get('__slots__', ())
+                      if name not in ('__dict__', '__weakref__'))
+        SLOT_NAMES[cls] = names
+    return names
+
+
+def storage_from_env() -> Storage:
+    """ Storage engine selected by the STORAGE_TYPE environment variable:
+    "file" (default; shared by several processes if STORAGE_MULTI_PROCESS
+    is 1) or "sqlite" (database file STORAGE_PATH)
+    """
+    storage_type = getenv("STORAGE_TYPE", "file")
+    if storage_type == "sqlite":
+        from models.sqlite_storage import SQLiteStorage
+        return SQLiteStorage(getenv("STORAGE_PATH", ".db.sqlite3"))
+    if storage_type != "file":
+        raise ValueError("Unknown STORAGE_TYPE {}".format(storage_type))
+    return FileStorage(getenv("STORAGE_MULTI_PROCESS") == "1")
 
 
 class Base():
     """ Base class
     """
 
+    # Models declare their attributes in __slots__ to avoid a per-object
+    # __dict__; subclasses without __slots__ still get one
+    __slots__ = ('id', 'created_at', 'updated_at')
+
+    # Storage engine, shared by all models unless a model overrides it
+    storage = storage_from_env()
+    # Attributes with a secondary (hash or database) index
+    indexed_attributes = ()
+    # Attributes also kept sorted, for Prefix and Range searches
+    sorted_attributes = ()
+    # FileStorage settings, see models.file_storage.FileStorage
+    flush_interval = 0
+    flush_max_pending = 1000
+    lazy_load = False
+
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a Base instance
         """
-        s_class = str(self.__class__.__name__)
-        if DATA.get(s_class) is None:
-            DATA[s_class] = {}
-
         self.id = kwargs.get('id', str(uuid.uuid4()))
+        now = None
         if kwargs.get('created_at') is not None:
-            self.created_at = datetime.strptime(kwargs.get('created_at'),
-                                                TIMESTAMP_FORMAT)
+            self.created_at = parse_timestamp(kwargs.get('created_at'))
         else:
-            self.created_at = datetime.utcnow()
+            self.created_at = now = datetime.utcnow()
+        # datetimes are immutable: an unchanged object shares one instance
         if kwargs.get('updated_at') is not None:
-            self.updated_at = datetime.strptime(kwargs.get('updated_at'),
-                                                TIMESTAMP_FORMAT)
+            if kwargs.get('updated_at') == kwargs.get('created_at'):
+                self.updated_at = self.created_at
+            else:
+                self.updated_at = parse_timestamp(kwargs.get('updated_at'))
         else:
-            self.updated_at = datetime.utcnow()
+            self.updated_at = now or datetime.utcnow()
 
     def __eq__(self, other: TypeVar('Base')) -> bool:
         """ Equality
@@ -48,11 +92,16 @@ class Base():
         """ Convert the object a JSON dictionary
         """
         result = {}
-        for key, value in self.__dict__.items():
+        items = [(key, getattr(self, key, _UNSET))
+                 for key in _slot_names(type(self))]
+        items.extend(getattr(self, '__dict__', {}).items())
+        for key, value in items:
+            if value is _UNSET:
+                continue
             if not for_serialization and key[0] == '_':
                 continue
             if type(value) is datetime:
-                result[key] = value.strftime(TIMESTAMP_FORMAT)
+                result[key] = format_timestamp(value)
             else:
                 result[key] = value
         return result
@@ -61,52 +110,55 @@ class Base():
     def load_from_file(cls):
         """ Load all objects from file
         """
-        s_class = cls.__name__
-        file_path = ".db_{}.json".format(s_class)
-        DATA[s_class] = {}
-        if not path.exists(file_path):
-            return
-
-        with open(file_path, 'r') as f:
-            objs_json = json.load(f)
-            for obj_id, obj_json in objs_json.items():
-                DATA[s_class][obj_id] = cls(**obj_json)
+        cls.storage.load(cls)
 
     @classmethod
     def save_to_file(cls):
         """ Save all objects to file
         """
-        s_class = cls.__name__
-        file_path = ".db_{}.json".format(s_class)
-        objs_json = {}
-        for obj_id, obj in DATA[s_class].items():
-            objs_json[obj_id] = obj.to_json(True)
+        cls.storage.save_all(cls)
+
+    @classmethod
+    def flush(cls):
+        """ Persist the pending (coalesced) writes of the class
+        """
+        cls.storage.flush(cls)
 
-        with open(file_path, 'w') as f:
-            json.dump(objs_json, f)
+    @classmethod
+    def compact(cls):
+        """ Compact the persisted writes of the class
+        """
+        cls.storage.compact(cls)
 
     def save(self):
         """ Save current object
         """
-        s_class = self.__class__.__name__
         self.updated_at = datetime.utcnow()
-        DATA[s_class][self.id] = self
-        self.__class__.save_to_file()
+        self.__class__.storage.save(self)
+
+    @classmethod
+    def save_many(cls, objs: List[TypeVar('Base')]):
+        """ Save several objects at once, as they are (updated_at is left
+        to the caller)
+        """
+        cls.storage.save_many(objs)
 
     def remove(self):
         """ Remove object
         """
-        s_class = self.__class__.__name__
-        if DATA[s_class].get(self.id) is not None:
-            del DATA[s_class][self.id]
-            self.__class__.save_to_file()
+        self.__class__.storage.remove(self)
+
+    @classmethod
+    def remove_many(cls, objs: List[TypeVar('Base')]):
+        """ Remove several objects at once
+        """
+        cls.storage.remove_many(objs)
 
     @classmethod
     def count(cls) -> int:
         """ Count all objects
         """
-        s_class = cls.__name__
-        return len(DATA[s_class].keys())
+        return cls.storage.count(cls)
 
     @classmethod
     def all(cls) -> Iterable[TypeVar('Base')]:
@@ -114,24 +166,22 @@ class Base():
         """
         return cls.search()
 
+    @classmethod
+    def scan(cls, after: str = None) -> Iterator[TypeVar('Base')]:
+        """ Iterate over all objects, starting after the object with ID
+        after (KeyError if there is none)
+        """
+        return cls.storage.scan(cls, after)
+
     @classmethod
     def get(cls, id: str) -> TypeVar('Base'):
         """ Return one object by ID
         """
-        s_class = cls.__name__
-        return DATA[s_class].get(id)
+        return cls.storage.get(cls, id)
 
     @classmethod
     def search(cls, attributes: dict = {}) -> List[TypeVar('Base')]:
         """ Search all objects with matching attributes
+        (values may be models.storage Prefix or Range conditions)
         """
-        s_class = cls.__name__
-        def _search(obj):
-            if len(attributes) == 0:
-                return True
-            for k, v in attributes.items():
-                if (getattr(obj, k) != v):
-                    return False
-            return True
-        
-        return list(filter(_search, DATA[s_class].values()))
+        return cls.storage.search(cls, attributes)
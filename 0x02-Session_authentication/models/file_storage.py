@@ -0,0 +1,975 @@
+#!/usr/bin/env python3
+""" File storage module
+
+Default storage engine: objects live in the process-global DATA dict,
+writes go to an append-only journal compacted into a JSON snapshot.
+"""
+from bisect import bisect_left, bisect_right
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from typing import TypeVar, Iterator, List
+from os import path
+import atexit
+import fcntl
+import mmap
+import os
+import re
+import shutil
+import threading
+import time
+
+from models.serializer import dumps, loads
+from models.storage import Condition, Prefix, Range, Storage, matches
+
+
+# Journal operations after which a class snapshot is compacted
+# (at least as many as there are objects, so compaction stays amortized)
+JOURNAL_COMPACT_THRESHOLD = 1000
+DATA = {}
+INDEXES = {}
+# class -> attribute -> value group -> (sorted values, ids in the same
+# order), or None for a group of unorderable values
+SORTED_INDEXES = {}
+INDEXED_KEYS = {}
+# class -> (ids in iteration order, None where removed; id -> position),
+# built by the first scan and kept up to date until DATA is reloaded
+SCAN_ORDERS = {}
+JOURNALS = {}
+JOURNAL_OPS = {}
+COMPACTING = set()
+PENDING = {}
+DIRTY_CLASSES = {}
+LAST_FLUSH = {}
+# class -> (snapshot id, journal inode, journal offset) of the files as
+# last read or written (the offset ends the last complete journal line),
+# and (multi_process) the (pid, file) of its lock file
+FILE_STATE = {}
+LOCK_FILES = {}
+LOCK_DEPTH = {}
+STORE_LOCK = threading.RLock()
+COMPACT_LOCK = threading.Lock()
+_FLUSHER = None
+_FLUSHER_WAKEUP = threading.Event()
+_UNHASHABLE = object()
+# Raw index key of the records whose value could not be read from the
+# raw text (objects and arrays): they are materialized on every lookup
+_UNPARSED = object()
+# One "<id>\t<json>" record per line in the lazy snapshot format
+_RECORD = re.compile(rb'^([^\t\n]*)\t[^\n]*\n?', re.M)
+
+
+def _sort_group(value):
+    """ Group of a value in a sorted index: values of one group compare
+    with each other (numbers together, other types apart)
+    """
+    if type(value) in (bool, int, float):
+        return float
+    return type(value)
+
+
+def _index_key(value):
+    """ Key of a value in an index (unhashable values share one bucket)
+    """
+    try:
+        hash(value)
+    except TypeError:
+        return _UNHASHABLE
+    return value
+
+
+class LazyObjects(MutableMapping):
+    """ id -> object mapping over a memory-mapped line-delimited snapshot
+
+    Only an id -> byte range index is built up front; a record is parsed
+    into an object the first time it is accessed (and then indexed).
+    Ids iterate in file order, then objects added since in insertion
+    order, whether or not records were materialized.
+    """
+
+    def __init__(self, cls, file_path: str):
+        """ Map file_path and index its records by id
+        """
+        self._cls = cls
+        # snapshot ids -> byte range, None once materialized into _objs
+        self._offsets = {}
+        self._objs = {}
+        # objects not in the snapshot
+        self._new = {}
+        self._raw_indexes = {}
+        self._mm = None
+        # record start offsets and ids, in file order
+        self._starts = []
+        self._ids = []
+        if path.getsize(file_path) == 0:
+            return
+        with open(file_path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        for match in _RECORD.finditer(self._mm):
+            obj_id = match.group(1).decode('utf-8')
+            self._offsets[obj_id] = match.span()
+            self._starts.append(match.start())
+            self._ids.append(obj_id)
+
+    def _materialize(self, obj_id: str):
+        """ Parse the record of obj_id into an object
+        """
+        with STORE_LOCK:
+            obj = self._objs.get(obj_id)
+            if obj is not None:
+                return obj
+            start, end = self._offsets[obj_id]
+            line = self._mm[start:end]
+            obj = self._cls(**loads(line[line.index(b'\t') + 1:]))
+            self._offsets[obj_id] = None
+            self._objs[obj_id] = obj
+            _index_add(self._cls, obj)
+            return obj
+
+    def materialize_matching(self, attr: str, value):
+        """ Materialize every record whose attr equals value
+
+        The first call for an attribute builds a value -> ids index of
+        the raw records in one regex pass over the mapped file. Only
+        string and scalar values are read that way; records with another
+        value are materialized by every call.
+        """
+        if self._mm is None:
+            return
+        raw_index = self._raw_indexes.get(attr)
+        if raw_index is None:
+            raw_index = self._raw_indexes[attr] = {}
+            pattern = re.compile(b'"' + re.escape(attr.encode()) +
+                                 rb'":("(?:[^"\\\n]|\\.)*"|[^,}\n]*)')
+            starts, ids = self._starts, self._ids
+            for match in pattern.finditer(self._mm):
+                obj_id = ids[bisect_right(starts, match.start()) - 1]
+                try:
+                    key = _index_key(loads(match.group(1)))
+                except ValueError:
+                    key = _UNPARSED
+                raw_index.setdefault(key, []).append(obj_id)
+        for key in (_index_key(value), _UNPARSED):
+            for obj_id in raw_index.get(key, ()):
+                if self._offsets.get(obj_id) is not None:
+                    self._materialize(obj_id)
+
+    def materialize_all(self):
+        """ Materialize every record
+        """
+        for obj_id, span in list(self._offsets.items()):
+            if span is not None:
+                self._materialize(obj_id)
+
+    def loaded(self) -> list:
+        """ Objects materialized so far
+        """
+        return list(self._objs.values()) + list(self._new.values())
+
+    def records(self) -> list:
+        """ Objects, and (mmap, start, end) for records not materialized,
+        in iteration order
+        """
+        return [(self._mm,) + span if span is not None
+                else self._objs[obj_id]
+                for obj_id, span in self._offsets.items()] \
+            + list(self._new.values())
+
+    def __getitem__(self, obj_id: str):
+        """ Object of obj_id, materialized on first access
+        """
+        obj = self._objs.get(obj_id)
+        if obj is None:
+            obj = self._new.get(obj_id)
+        if obj is not None:
+            return obj
+        if obj_id in self._offsets:
+            return self._materialize(obj_id)
+        raise KeyError(obj_id)
+
+    def __setitem__(self, obj_id: str, obj):
+        """ Store an in-memory object, shadowing its raw record
+        """
+        if obj_id in self._offsets:
+            self._offsets[obj_id] = None
+            self._objs[obj_id] = obj
+        else:
+            self._new[obj_id] = obj
+
+    def __delitem__(self, obj_id: str):
+        """ Drop an object or its raw record
+        """
+        if obj_id not in self:
+            raise KeyError(obj_id)
+        self.pop(obj_id)
+
+    def pop(self, obj_id: str, *default):
+        """ Drop obj_id without materializing a raw record
+        """
+        if obj_id in self._offsets:
+            del self._offsets[obj_id]
+            return self._objs.pop(obj_id, None)
+        return self._new.pop(obj_id, *default)
+
+    def __contains__(self, obj_id) -> bool:
+        """ Membership without materializing
+        """
+        return obj_id in self._offsets or obj_id in self._new
+
+    def __iter__(self):
+        """ Iterate over all ids
+        """
+        return iter(list(self._offsets) + list(self._new))
+
+    def __len__(self) -> int:
+        """ Number of objects, materialized or not
+        """
+        return len(self._offsets) + len(self._new)
+
+
+def _objects(cls):
+    """ id -> object mapping of cls, created empty on first use
+    """
+    objs = DATA.get(cls.__name__)
+    if objs is None:
+        with STORE_LOCK:
+            objs = DATA.get(cls.__name__)
+            if objs is None:
+                _reset_indexes(cls)
+                objs = DATA[cls.__name__] = {}
+    return objs
+
+
+def _reset_indexes(cls):
+    """ Empty the secondary indexes of the class
+    """
+    s_class = cls.__name__
+    INDEXES[s_class] = {attr: {} for attr in cls.indexed_attributes}
+    SORTED_INDEXES[s_class] = {attr: {} for attr in cls.sorted_attributes}
+    INDEXED_KEYS[s_class] = {}
+
+
+def _index_add(cls, obj, keep_sorted: bool = True):
+    """ Add an object to the secondary indexes
+
+    With keep_sorted False, sorted indexes are only appended to and
+    _sort_indexes must be called after a batch of additions. Values that
+    cannot be ordered within their group are left out (None in the
+    indexed keys).
+    """
+    s_class = cls.__name__
+    keys = tuple(_index_key(getattr(obj, attr, None))
+                 for attr in cls.indexed_attributes)
+    for attr, key in zip(cls.indexed_attributes, keys):
+        INDEXES[s_class][attr].setdefault(key, {})[obj.id] = obj
+    if cls.sorted_attributes:
+        values = []
+        for attr in cls.sorted_attributes:
+            value = getattr(obj, attr, None)
+            groups = SORTED_INDEXES[s_class][attr]
+            if value is not None:
+                group = _sort_group(value)
+                if group not in groups:
+                    groups[group] = ([], [])
+                if groups[group] is None:
+                    value = None
+            if value is not None:
+                sorted_values, ids = groups[group]
+                try:
+                    # the first value of a group is not compared by the
+                    # bisect (nor by sorted): check it orders by itself
+                    value < value
+                    i = bisect_right(sorted_values, value) if keep_sorted \
+                        else len(ids)
+                except TypeError:
+                    groups[group] = None
+                    value = None
+                else:
+                    sorted_values.insert(i, value)
+                    ids.insert(i, obj.id)
+            values.append(value)
+        keys += tuple(values)
+    INDEXED_KEYS[s_class][obj.id] = keys
+
+
+def _sort_indexes(cls):
+    """ Sort the sorted indexes of the class (a group of unorderable
+    values is dropped)
+    """
+    for groups in SORTED_INDEXES[cls.__name__].values():
+        for group, index in groups.items():
+            if index is None:
+                continue
+            try:
+                pairs = sorted(zip(*index))
+            except TypeError:
+                groups[group] = None
+                continue
+            index[0][:] = [pair[0] for pair in pairs]
+            index[1][:] = [pair[1] for pair in pairs]
+
+
+def _index_discard(cls, obj_id: str):
+    """ Remove an object from the secondary indexes
+    """
+    s_class = cls.__name__
+    keys = INDEXED_KEYS[s_class].pop(obj_id, None)
+    if keys is None:
+        return
+    for attr, key in zip(cls.indexed_attributes, keys):
+        bucket = INDEXES[s_class][attr].get(key)
+        if bucket is not None:
+            bucket.pop(obj_id, None)
+            if not bucket:
+                del INDEXES[s_class][attr][key]
+    values = keys[len(cls.indexed_attributes):]
+    for attr, value in zip(cls.sorted_attributes, values):
+        if value is None:
+            continue
+        index = SORTED_INDEXES[s_class][attr].get(_sort_group(value))
+        if index is None:
+            continue
+        sorted_values, ids = index
+        i = bisect_left(sorted_values, value)
+        while i < len(ids) and sorted_values[i] == value:
+            if ids[i] == obj_id:
+                del sorted_values[i]
+                del ids[i]
+                break
+            i += 1
+
+
+def _scan_order(cls) -> tuple:
+    """ (ids, positions) scan order of the class, built on first use
+
+    The caller holds the store lock.
+    """
+    order = SCAN_ORDERS.get(cls.__name__)
+    if order is None:
+        ids = list(_objects(cls))
+        order = SCAN_ORDERS[cls.__name__] = (
+            ids, {obj_id: i for i, obj_id in enumerate(ids)})
+    return order
+
+
+def _scan_order_add(cls, obj_id: str):
+    """ Append a new id to the scan order of the class, if built
+    """
+    order = SCAN_ORDERS.get(cls.__name__)
+    if order is not None and obj_id not in order[1]:
+        ids, positions = order
+        positions[obj_id] = len(ids)
+        ids.append(obj_id)
+
+
+def _scan_order_discard(cls, obj_id: str):
+    """ Remove an id from the scan order of the class, if built
+
+    The order is dropped (and rebuilt by the next scan) once most of its
+    ids are removed ones, so removes stay amortized constant time.
+    """
+    order = SCAN_ORDERS.get(cls.__name__)
+    if order is None:
+        return
+    ids, positions = order
+    i = positions.pop(obj_id, None)
+    if i is None:
+        return
+    ids[i] = None
+    if len(positions) * 2 < len(ids):
+        del SCAN_ORDERS[cls.__name__]
+
+
+def _apply_change(cls, obj_id: str, obj: TypeVar('Base') = None,
+                  index: bool = True):
+    """ Store (obj) or drop (obj is None) an object of DATA
+
+    DATA and the indexes change in one step under the store lock, so
+    concurrent saves and removes never leave an index out of date.
+    """
+    objs = _objects(cls)
+    with STORE_LOCK:
+        if index:
+            _index_discard(cls, obj_id)
+        if obj is None:
+            objs.pop(obj_id, None)
+            _scan_order_discard(cls, obj_id)
+        else:
+            objs[obj_id] = obj
+            _scan_order_add(cls, obj_id)
+            if index:
+                _index_add(cls, obj)
+
+
+def _snapshot_id(cls):
+    """ (inode, mtime, size) of the snapshot file of cls, or None
+    """
+    for file_path in (".db_{}.jsonl", ".db_{}.json"):
+        try:
+            st = os.stat(file_path.format(cls.__name__))
+        except FileNotFoundError:
+            continue
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+    return None
+
+
+def _journal_stat(journal_path: str) -> tuple:
+    """ (inode, size) of a journal file, (None, 0) if there is none
+    """
+    try:
+        st = os.stat(journal_path)
+    except FileNotFoundError:
+        return None, 0
+    return st.st_ino, st.st_size
+
+
+def flush_all():
+    """ Persist the pending writes of every model class
+    """
+    with STORE_LOCK:
+        classes = list(DIRTY_CLASSES.values())
+    for cls in classes:
+        cls.flush()
+
+
+def _flush_loop():
+    """ Background flusher: persist each dirty class once its
+    flush_interval has elapsed since its last flush
+    """
+    while True:
+        with STORE_LOCK:
+            classes = list(DIRTY_CLASSES.values())
+        now = time.monotonic()
+        timeout = 1.0
+        for cls in classes:
+            due = LAST_FLUSH.get(cls.__name__, 0) + cls.flush_interval
+            if due <= now:
+                cls.flush()
+            else:
+                timeout = min(timeout, due - now)
+        _FLUSHER_WAKEUP.wait(timeout)
+        _FLUSHER_WAKEUP.clear()
+
+
+def _start_flusher():
+    """ Start the background flusher thread once
+    """
+    global _FLUSHER
+    with STORE_LOCK:
+        if _FLUSHER is None:
+            _FLUSHER = threading.Thread(target=_flush_loop, daemon=True)
+            _FLUSHER.start()
+            atexit.register(flush_all)
+
+
+def _journal_change(obj_id: str, obj: TypeVar('Base') = None) -> tuple:
+    """ Change of an upsert (obj) or a delete (obj is None): the object
+    and its serialized journal line
+
+    Serializing comes first, so a value that cannot be written raises
+    before anything changed in DATA.
+    """
+    if obj is None:
+        entry = {"op": "delete", "id": obj_id}
+    else:
+        entry = {"op": "upsert", "id": obj_id, "obj": obj.to_json(True)}
+    return obj, dumps(entry) + "\n"
+
+
+class FileStorage(Storage):
+    """ In-memory dict + JSON file storage engine
+
+    Per model class settings (class attributes):
+      - indexed_attributes: attributes with a secondary hash index
+      - sorted_attributes: attributes with a sorted index (one per
+        group of comparable values, None left out) for Prefix and
+        Range searches
+      - flush_interval / flush_max_pending: write coalescing; with
+        flush_interval (seconds) > 0, save/remove only mark objects
+        dirty and a background thread persists them at most once per
+        interval, or as soon as flush_max_pending objects are dirty.
+        0 writes every change through immediately.
+      - lazy_load: snapshot kept as ".db_<Class>.jsonl" ("<id>\\t<json>"
+        lines), memory-mapped, objects built only on get/search hits
+
+    With multi_process, several processes can share the files: writes
+    and compactions hold an exclusive lock on ".db_<Class>.lock", and
+    reads first replay what other processes appended to the journal
+    (or reload everything when the snapshot was replaced).
+    """
+
+    def __init__(self, multi_process: bool = False):
+        """ Initialize the engine
+        """
+        self.multi_process = multi_process
+
+    @contextmanager
+    def _file_lock(self, cls):
+        """ Hold the store lock and the lock file of the class
+
+        Re-entrant; does nothing without multi_process.
+        """
+        if not self.multi_process:
+            yield
+            return
+        s_class = cls.__name__
+        with STORE_LOCK:
+            depth = LOCK_DEPTH.get(s_class, 0)
+            if depth == 0:
+                pid, lock_file = LOCK_FILES.get(s_class, (None, None))
+                # a forked child shares the parent's lock, use its own
+                if pid != os.getpid():
+                    lock_file = open(".db_{}.lock".format(s_class), 'a')
+                    LOCK_FILES[s_class] = (os.getpid(), lock_file)
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            LOCK_DEPTH[s_class] = depth + 1
+            try:
+                yield
+            finally:
+                LOCK_DEPTH[s_class] = depth
+                if depth == 0:
+                    fcntl.flock(LOCK_FILES[s_class][1], fcntl.LOCK_UN)
+
+    def load(self, cls):
+        """ Load all objects from file
+        """
+        self.flush(cls)
+        with COMPACT_LOCK, STORE_LOCK, self._file_lock(cls):
+            self._reload(cls)
+
+    def _reload(self, cls):
+        """ Rebuild the objects of the class from its files
+
+        Reads the snapshot, then replays the journal written since.
+        With lazy_load, a line-delimited snapshot is only mapped.
+        The caller holds the locks.
+        """
+        s_class = cls.__name__
+        file_path = ".db_{}.json".format(s_class)
+        lazy_path = ".db_{}.jsonl".format(s_class)
+        journal_path = ".db_{}.journal".format(s_class)
+        self._close_journal(cls)
+        snapshot = _snapshot_id(cls)
+        DATA[s_class] = {}
+        SCAN_ORDERS.pop(s_class, None)
+        _reset_indexes(cls)
+        if path.exists(lazy_path) and cls.lazy_load:
+            DATA[s_class] = LazyObjects(cls, lazy_path)
+        elif path.exists(lazy_path):
+            DATA[s_class] = dict(LazyObjects(cls, lazy_path).items())
+        elif path.exists(file_path):
+            with open(file_path, 'rb') as f:
+                objs_json = loads(f.read())
+                for obj_id, obj_json in objs_json.items():
+                    DATA[s_class][obj_id] = cls(**obj_json)
+        ops, _ = self._replay_journal(cls, journal_path + ".compacting")
+        journal_ino, _ = _journal_stat(journal_path)
+        more_ops, offset = self._replay_journal(cls, journal_path)
+        JOURNAL_OPS[s_class] = ops + more_ops
+        FILE_STATE[s_class] = (snapshot, journal_ino, offset)
+        objs = DATA[s_class]
+        if isinstance(objs, LazyObjects):
+            objs = objs.loaded()
+        else:
+            objs = objs.values()
+        for obj in objs:
+            _index_add(cls, obj, False)
+        _sort_indexes(cls)
+
+    def _replay_journal(self, cls, journal_path: str, offset: int = 0,
+                        index: bool = False) -> tuple:
+        """ Apply the operations of a journal file, from offset, to DATA
+
+        A torn last line (interrupted write) ends the replay.
+        Returns the number of operations applied and the offset where
+        the replay stopped.
+        """
+        if not path.exists(journal_path):
+            return 0, 0
+        ops = 0
+        with open(journal_path, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    entry = loads(line)
+                except ValueError:
+                    break
+                if entry["op"] == "upsert":
+                    _apply_change(cls, entry["id"], cls(**entry["obj"]),
+                                  index)
+                elif entry["op"] == "delete":
+                    _apply_change(cls, entry["id"], None, index)
+                offset += len(line)
+                ops += 1
+        return ops, offset
+
+    def _sync(self, cls):
+        """ Catch up with the writes of other processes (multi_process)
+
+        Two stat() calls when nothing changed. Otherwise replays the
+        journal from where the last read stopped, or reloads everything
+        when the snapshot was replaced or the journal rotated.
+        """
+        if not self.multi_process:
+            return
+        s_class = cls.__name__
+        journal_path = ".db_{}.journal".format(s_class)
+        state = FILE_STATE.get(s_class)
+        if state is not None and state[0] == _snapshot_id(cls) \
+                and _journal_stat(journal_path) == state[1:]:
+            return
+        with self._file_lock(cls):
+            state = FILE_STATE.get(s_class)
+            snapshot = _snapshot_id(cls)
+            journal_ino, size = _journal_stat(journal_path)
+            if state is None or state[0] != snapshot or size < state[2] \
+                    or state[1] not in (None, journal_ino):
+                self._reload(cls)
+            else:
+                ops, offset = self._replay_journal(cls, journal_path,
+                                                   state[2], True)
+                JOURNAL_OPS[s_class] = JOURNAL_OPS.get(s_class, 0) + ops
+                FILE_STATE[s_class] = (snapshot, journal_ino, offset)
+            # writes of this process not flushed yet still win
+            for obj_id, (obj, _) in PENDING.get(s_class, {}).items():
+                _apply_change(cls, obj_id, obj)
+
+    def save_all(self, cls):
+        """ Save all objects to file
+
+        Writes a full snapshot and empties the journal.
+        """
+        s_class = cls.__name__
+        journal_path = ".db_{}.journal".format(s_class)
+        with COMPACT_LOCK, STORE_LOCK, self._file_lock(cls):
+            self._sync(cls)
+            PENDING.pop(s_class, None)
+            DIRTY_CLASSES.pop(s_class, None)
+            self._write_snapshot(cls, self._snapshot_records(cls))
+            self._close_journal(cls)
+            for stale in (journal_path, journal_path + ".compacting"):
+                if path.exists(stale):
+                    os.remove(stale)
+            JOURNAL_OPS[s_class] = 0
+            FILE_STATE[s_class] = (_snapshot_id(cls), None, 0)
+
+    def _snapshot_records(self, cls) -> list:
+        """ Objects to snapshot (raw records for unloaded lazy objects)
+        """
+        objs = _objects(cls)
+        if isinstance(objs, LazyObjects):
+            return objs.records()
+        return list(objs.values())
+
+    def _write_snapshot(self, cls, records: list):
+        """ Atomically replace the snapshot file with records
+
+        Objects are serialized; (mmap, start, end) raw records are
+        copied as they are.
+        """
+        file_path = ".db_{}.json".format(cls.__name__)
+        lazy_path = ".db_{}.jsonl".format(cls.__name__)
+        if cls.lazy_load:
+            file_path, lazy_path = lazy_path, file_path
+            tmp_path = "{}.tmp".format(file_path)
+            with open(tmp_path, 'wb') as f:
+                for rec in records:
+                    if isinstance(rec, tuple):
+                        line = rec[0][rec[1]:rec[2]]
+                        f.write(line if line.endswith(b'\n')
+                                else line + b'\n')
+                    else:
+                        f.write("{}\t{}\n".format(
+                            rec.id, dumps(rec.to_json(True))).encode('utf-8'))
+        else:
+            objs_json = {}
+            for obj in records:
+                objs_json[obj.id] = obj.to_json(True)
+            tmp_path = "{}.tmp".format(file_path)
+            with open(tmp_path, 'w') as f:
+                f.write(dumps(objs_json))
+        os.replace(tmp_path, file_path)
+        # the snapshot in the other format is stale now
+        if path.exists(lazy_path):
+            os.remove(lazy_path)
+
+    def _close_journal(self, cls):
+        """ Close the open journal file of the class, if any
+        """
+        journal = JOURNALS.pop(cls.__name__, None)
+        if journal is not None:
+            journal.close()
+
+    def _append_journal(self, cls, changes: dict):
+        """ Append changes (id -> _journal_change) to the journal in one
+        write
+
+        A torn write left by a crash after the last good offset is
+        truncated first, so these lines are not merged into it.
+        Starts a background compaction once enough operations piled up.
+        """
+        s_class = cls.__name__
+        lines = "".join(line for _, line in changes.values()).encode('utf-8')
+        with STORE_LOCK, self._file_lock(cls):
+            if self.multi_process:
+                # replay the other writers first, then put these on top
+                self._sync(cls)
+                for obj_id, (obj, _) in changes.items():
+                    _apply_change(cls, obj_id, obj)
+            journal = JOURNALS.get(s_class)
+            if journal is None:
+                journal_path = ".db_{}.journal".format(s_class)
+                journal = JOURNALS[s_class] = open(journal_path, 'ab')
+            state = FILE_STATE.get(s_class)
+            if state is not None:
+                # drop the torn write of a crashed process, if any
+                if os.fstat(journal.fileno()).st_size > state[2]:
+                    journal.truncate(state[2])
+            journal.write(lines)
+            journal.flush()
+            if state is not None:
+                st = os.fstat(journal.fileno())
+                FILE_STATE[s_class] = (state[0], st.st_ino, st.st_size)
+            JOURNAL_OPS[s_class] = JOURNAL_OPS.get(s_class, 0) + len(changes)
+            threshold = max(JOURNAL_COMPACT_THRESHOLD, len(_objects(cls)))
+            if JOURNAL_OPS[s_class] >= threshold \
+                    and s_class not in COMPACTING:
+                COMPACTING.add(s_class)
+                threading.Thread(target=self.compact, args=(cls,),
+                                 daemon=True).start()
+
+    def compact(self, cls):
+        """ Fold the journal into a new snapshot
+
+        The journal is rotated aside under the store lock; the snapshot
+        is written without holding it, so saves keep going meanwhile
+        (except with multi_process, where the lock file is held
+        throughout).
+        """
+        s_class = cls.__name__
+        journal_path = ".db_{}.journal".format(s_class)
+        rotated_path = journal_path + ".compacting"
+        try:
+            with COMPACT_LOCK, self._file_lock(cls):
+                self._sync(cls)
+                with STORE_LOCK:
+                    records = self._snapshot_records(cls)
+                    self._close_journal(cls)
+                    if path.exists(journal_path):
+                        if path.exists(rotated_path):
+                            with open(journal_path, 'rb') as src, \
+                                    open(rotated_path, 'ab') as dst:
+                                shutil.copyfileobj(src, dst)
+                            os.remove(journal_path)
+                        else:
+                            os.replace(journal_path, rotated_path)
+                    JOURNAL_OPS[s_class] = 0
+                    state = FILE_STATE.get(s_class)
+                    if state is not None:
+                        # the next append starts a new journal
+                        FILE_STATE[s_class] = (state[0], None, 0)
+                self._write_snapshot(cls, records)
+                if path.exists(rotated_path):
+                    os.remove(rotated_path)
+                if self.multi_process:
+                    FILE_STATE[s_class] = (_snapshot_id(cls), None, 0)
+        finally:
+            with STORE_LOCK:
+                COMPACTING.discard(s_class)
+
+    def _persist(self, cls, changes: dict):
+        """ Persist changes (id -> _journal_change)
+
+        Written through right away in one journal write, or queued when
+        the class coalesces its writes.
+        """
+        if cls.flush_interval <= 0:
+            self._append_journal(cls, changes)
+            return
+        s_class = cls.__name__
+        with STORE_LOCK:
+            pending = PENDING.setdefault(s_class, {})
+            pending.update(changes)
+            if s_class not in DIRTY_CLASSES:
+                DIRTY_CLASSES[s_class] = cls
+                LAST_FLUSH.setdefault(s_class, time.monotonic())
+                _FLUSHER_WAKEUP.set()
+            full = len(pending) >= cls.flush_max_pending
+        _start_flusher()
+        if full:
+            self.flush(cls)
+
+    def flush(self, cls):
+        """ Persist the pending (coalesced) writes of the class
+        """
+        s_class = cls.__name__
+        with STORE_LOCK:
+            pending = PENDING.pop(s_class, None)
+            DIRTY_CLASSES.pop(s_class, None)
+            LAST_FLUSH[s_class] = time.monotonic()
+            if pending:
+                self._append_journal(cls, pending)
+
+    def save(self, obj: TypeVar('Base')):
+        """ Store obj in DATA and persist it
+        """
+        cls = obj.__class__
+        change = _journal_change(obj.id, obj)
+        _apply_change(cls, obj.id, obj)
+        self._persist(cls, {obj.id: change})
+
+    def save_many(self, objs: List[TypeVar('Base')]):
+        """ Store objects in DATA and persist the upserts of each class
+        in one write
+        """
+        changes = {}
+        for obj in objs:
+            changes.setdefault(obj.__class__, {})[obj.id] = \
+                _journal_change(obj.id, obj)
+        for cls, upserts in changes.items():
+            for obj_id, (obj, _) in upserts.items():
+                _apply_change(cls, obj_id, obj)
+        for cls, upserts in changes.items():
+            self._persist(cls, upserts)
+
+    def remove(self, obj: TypeVar('Base')):
+        """ Drop obj from DATA and persist the delete
+        """
+        self.remove_many([obj])
+
+    def remove_many(self, objs: List[TypeVar('Base')]):
+        """ Drop objects from DATA and persist the deletes of each class
+        in one write
+        """
+        changes = {}
+        for obj in objs:
+            cls = obj.__class__
+            if cls not in changes:
+                self._sync(cls)
+                changes[cls] = {}
+            stored = _objects(cls)
+            with STORE_LOCK:
+                if stored.get(obj.id) is not None:
+                    del stored[obj.id]
+                    _scan_order_discard(cls, obj.id)
+                    _index_discard(cls, obj.id)
+                    changes[cls][obj.id] = _journal_change(obj.id)
+        for cls, deletes in changes.items():
+            if deletes:
+                self._persist(cls, deletes)
+
+    def count(self, cls) -> int:
+        """ Count all objects
+        """
+        self._sync(cls)
+        return len(_objects(cls))
+
+    def get(self, cls, obj_id: str) -> TypeVar('Base'):
+        """ Return one object by ID
+        """
+        self._sync(cls)
+        return _objects(cls).get(obj_id)
+
+    def scan(self, cls, after: str = None) -> Iterator[TypeVar('Base')]:
+        """ Iterate over all objects, starting after the object with ID
+        after (KeyError if there is none)
+
+        Walks the scan order of the class up to its length at the call,
+        so the store may change meanwhile; objects removed since are
+        skipped. The cursor is found in its id -> position map: resuming
+        costs the same whatever the number of objects.
+        """
+        self._sync(cls)
+        objs = _objects(cls)
+        with STORE_LOCK:
+            ids, positions = _scan_order(cls)
+            start = 0
+            if after is not None:
+                try:
+                    start = positions[after] + 1
+                except KeyError:
+                    raise KeyError(after)
+            end = len(ids)
+        return (obj for obj in map(objs.get,
+                                   map(ids.__getitem__, range(start, end)))
+                if obj is not None)
+
+    def _sorted_candidates(self, cls, attr: str, value) -> list:
+        """ Objects whose attr may equal or satisfy value, found by
+        bisecting its sorted index; None if the index cannot tell
+
+        Only the group of the searched value is bisected: values of
+        other groups never equal it, start with a prefix or fall in a
+        range of it.
+        """
+        if isinstance(value, Prefix):
+            group = str
+        elif isinstance(value, Range):
+            if value.low is None and value.high is None:
+                return None
+            group = _sort_group(value.high if value.low is None
+                                else value.low)
+        elif isinstance(value, Condition):
+            return None
+        else:
+            group = _sort_group(value)
+        objs = _objects(cls)
+        with STORE_LOCK:
+            groups = SORTED_INDEXES[cls.__name__][attr]
+            if group not in groups:
+                return []
+            if groups[group] is None:
+                return None
+            sorted_values, ids = groups[group]
+            try:
+                if isinstance(value, Prefix):
+                    lo = hi = bisect_left(sorted_values, value.prefix)
+                    while hi < len(ids) \
+                            and sorted_values[hi].startswith(value.prefix):
+                        hi += 1
+                elif isinstance(value, Range):
+                    lo, hi = 0, len(ids)
+                    if value.low is not None:
+                        lo = bisect_left(sorted_values, value.low)
+                    if value.high is not None:
+                        hi = bisect_right(sorted_values, value.high)
+                else:
+                    lo = bisect_left(sorted_values, value)
+                    hi = bisect_right(sorted_values, value)
+            except TypeError:
+                # bounds of different groups
+                return []
+            found = [objs.get(obj_id) for obj_id in ids[lo:hi]]
+        return [obj for obj in found if obj is not None]
+
+    def search(self, cls, attributes: dict) -> List[TypeVar('Base')]:
+        """ Search all objects with matching attributes
+
+        Uses a secondary index when one of the attributes is indexed
+        (hash index for an equality, sorted index for a Prefix, Range or
+        equality, results then in attribute order), otherwise scans
+        every object.
+        """
+        self._sync(cls)
+        objs = _objects(cls)
+        lazy = isinstance(objs, LazyObjects)
+        candidates = None
+        for k in cls.indexed_attributes:
+            if k in attributes and not isinstance(attributes[k], Condition):
+                if lazy:
+                    objs.materialize_matching(k, attributes[k])
+                index = INDEXES[cls.__name__][k]
+                with STORE_LOCK:
+                    candidates = list(
+                        index.get(_index_key(attributes[k]), {}).values())
+                break
+        for k in cls.sorted_attributes:
+            if candidates is None and attributes.get(k) is not None:
+                if lazy:
+                    objs.materialize_all()
+                candidates = self._sorted_candidates(cls, k, attributes[k])
+        if candidates is None:
+            with STORE_LOCK:
+                candidates = list(objs.values())
+        return [obj for obj in candidates if matches(obj, attributes)]
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+""" Serializer module
+
+JSON and timestamp helpers shared by the file store and the API.
+Uses orjson or ujson when installed, the stdlib json module otherwise.
+The fast backends only handle 64-bit integers and finite floats: data
+they reject, or would change, goes through the stdlib json module.
+"""
+from datetime import datetime
+import json
+import math
+import re
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+# A number of 19 digits or more may not fit in 64 bits (orjson reads it
+# as a float): such documents are parsed by the stdlib
+_LONG_NUMBER = re.compile(r'[:,\[]\s*-?\d{19}')
+_LONG_NUMBER_BYTES = re.compile(rb'[:,\[]\s*-?\d{19}')
+
+
+def _orjson_dumps(obj, sort_keys: bool = False) -> str:
+    """ orjson dumps returning str
+    """
+    option = orjson.OPT_SORT_KEYS if sort_keys else 0
+    return orjson.dumps(obj, option=option).decode('utf-8')
+
+
+def _ujson_dumps(obj, sort_keys: bool = False) -> str:
+    """ ujson dumps matching the stdlib output for '/'
+    """
+    return ujson.dumps(obj, sort_keys=sort_keys,
+                       escape_forward_slashes=False)
+
+
+def _json_dumps(obj, sort_keys: bool = False) -> str:
+    """ Compact stdlib json dumps
+    """
+    return json.dumps(obj, sort_keys=sort_keys, separators=(',', ':'))
+
+
+BACKENDS = {"json": (_json_dumps, json.loads)}
+if ujson is not None:
+    BACKENDS["ujson"] = (_ujson_dumps, ujson.loads)
+if orjson is not None:
+    BACKENDS["orjson"] = (_orjson_dumps, orjson.loads)
+
+BACKEND = None
+_dumps = _loads = None
+
+
+def _non_finite(obj) -> bool:
+    """ True if obj holds a NaN or infinite float (written as null by
+    orjson)
+    """
+    if isinstance(obj, float):
+        return not math.isfinite(obj)
+    if isinstance(obj, dict):
+        return any(map(_non_finite, obj.values()))
+    if isinstance(obj, (list, tuple)):
+        return any(map(_non_finite, obj))
+    return False
+
+
+def set_backend(name: str = None):
+    """ Select the JSON backend by name, or the fastest installed one
+    """
+    global BACKEND, _dumps, _loads
+    if name is None:
+        name = next(n for n in ("orjson", "ujson", "json") if n in BACKENDS)
+    if name not in BACKENDS:
+        raise ValueError("JSON backend {} is not available".format(name))
+    BACKEND = name
+    _dumps, _loads = BACKENDS[name]
+
+
+def dumps(obj, sort_keys: bool = False) -> str:
+    """ Serialize obj to a compact JSON string
+    """
+    if _dumps is not _json_dumps:
+        try:
+            text = _dumps(obj, sort_keys)
+        except (TypeError, ValueError, OverflowError):
+            pass
+        else:
+            # NaN and infinities come out as null
+            if "null" not in text or not _non_finite(obj):
+                return text
+    return _json_dumps(obj, sort_keys)
+
+
+def loads(s):
+    """ Deserialize a JSON str or bytes
+    """
+    if _loads is not json.loads:
+        long_number = _LONG_NUMBER_BYTES if isinstance(s, bytes) \
+            else _LONG_NUMBER
+        if long_number.search(s) is None:
+            try:
+                return _loads(s)
+            except ValueError:
+                pass
+    return json.loads(s)
+
+
+def format_timestamp(value: datetime) -> str:
+    """ Format a datetime as TIMESTAMP_FORMAT
+    """
+    if 1000 <= value.year and value.tzinfo is None:
+        return value.isoformat(timespec='seconds')
+    return value.strftime(TIMESTAMP_FORMAT)
+
+
+def parse_timestamp(value: str) -> datetime:
+    """ Parse a TIMESTAMP_FORMAT string
+
+    fromisoformat accepts more (offsets, week dates, a space for 'T'),
+    so it is only trusted on the exact shape of TIMESTAMP_FORMAT.
+    """
+    if len(value) == 19 and value[10] == 'T' and value[4] == value[7] == '-' \
+            and value[13] == value[16] == ':':
+        try:
+            result = datetime.fromisoformat(value)
+        except ValueError:
+            pass
+        else:
+            if result.tzinfo is None:
+                return result
+    return datetime.strptime(value, TIMESTAMP_FORMAT)
+
+
+set_backend()
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+""" SQLite storage module
+
+Storage engine keeping each model class in a SQLite table, so the data
+does not have to fit in memory and can be shared by several processes.
+"""
+from datetime import datetime
+from typing import TypeVar, Iterator, List
+import sqlite3
+import threading
+
+from models.serializer import dumps, format_timestamp, loads
+from models.storage import Condition, Prefix, Range, Storage, matches
+
+
+# Rows fetched per query while scanning a table
+SCAN_BATCH = 500
+
+
+def _column_value(value):
+    """ SQLite value of an indexed attribute (JSON for other types)
+    """
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    if isinstance(value, datetime):
+        return format_timestamp(value)
+    return dumps(value)
+
+
+def _columns(cls) -> tuple:
+    """ Indexed columns of cls: indexed and sorted attributes
+    """
+    return tuple(dict.fromkeys(cls.indexed_attributes +
+                               cls.sorted_attributes))
+
+
+def _condition_sql(attr: str, value) -> tuple:
+    """ SQL test (and its parameters) of an indexed column for a search
+    value; None for conditions left to Python
+    """
+    if isinstance(value, Prefix):
+        if not value.prefix or value.prefix[-1] == chr(0x10ffff):
+            return '"{}" >= ?'.format(attr), [value.prefix]
+        # strings starting with prefix sort in [prefix, next prefix)
+        upper = value.prefix[:-1] + chr(ord(value.prefix[-1]) + 1)
+        return ('"{0}" >= ? AND "{0}" < ?'.format(attr),
+                [value.prefix, upper])
+    if isinstance(value, Range):
+        tests, params = ['"{}" IS NOT NULL'.format(attr)], []
+        if value.low is not None:
+            tests.append('"{}" >= ?'.format(attr))
+            params.append(_column_value(value.low))
+        if value.high is not None:
+            tests.append('"{}" <= ?'.format(attr))
+            params.append(_column_value(value.high))
+        return " AND ".join(tests), params
+    if isinstance(value, Condition):
+        return None
+    value = _column_value(value)
+    if value is None:
+        return '"{}" IS NULL'.format(attr), []
+    return '"{}" = ?'.format(attr), [value]
+
+
+class SQLiteStorage(Storage):
+    """ SQLite storage engine
+
+    One table per model class: the id, the JSON serialized object and
+    one indexed column per attribute of indexed_attributes and
+    sorted_attributes (timestamps as their ISO strings). The
+    database runs in WAL mode; every write is committed on its own.
+    """
+
+    def __init__(self, db_path: str = ".db.sqlite3"):
+        """ Initialize the engine on the database file db_path
+        """
+        self.db_path = db_path
+        self._local = threading.local()
+        self._tables = set()
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        """ Connection of the current thread
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30,
+                                   isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _table(self, cls) -> str:
+        """ Table of cls, created (with its indexes) on first use
+        """
+        name = cls.__name__
+        if name in self._tables:
+            return name
+        with self._lock:
+            conn = self._connection()
+            conn.execute('CREATE TABLE IF NOT EXISTS "{}" '
+                         '(id TEXT PRIMARY KEY, data TEXT NOT NULL)'
+                         .format(name))
+            columns = {row[1] for row in
+                       conn.execute('PRAGMA table_info("{}")'.format(name))}
+            for attr in _columns(cls):
+                if attr not in columns:
+                    conn.execute('ALTER TABLE "{}" ADD COLUMN "{}"'
+                                 .format(name, attr))
+                    conn.execute('UPDATE "{0}" SET "{1}" = '
+                                 'json_extract(data, \'$."{1}"\')'
+                                 .format(name, attr))
+                conn.execute('CREATE INDEX IF NOT EXISTS "ix_{0}_{1}" '
+                             'ON "{0}" ("{1}")'.format(name, attr))
+            self._tables.add(name)
+        return name
+
+    def _objects(self, cls, rows) -> List[TypeVar('Base')]:
+        """ Objects of cls built from (data,) rows
+        """
+        return [cls(**loads(row[0])) for row in rows]
+
+    def load(self, cls):
+        """ Make sure the table of cls exists (nothing is cached)
+        """
+        self._table(cls)
+
+    def save_all(self, cls):
+        """ Nothing to do: every write is already committed
+        """
+        self._table(cls)
+
+    def compact(self, cls):
+        """ Checkpoint the write-ahead log into the database file
+        """
+        self._connection().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def _upsert(self, conn: sqlite3.Connection, obj: TypeVar('Base')):
+        """ Insert or update the row of obj on conn
+        """
+        cls = obj.__class__
+        table = self._table(cls)
+        attrs = _columns(cls)
+        columns = "".join(', "{}"'.format(attr) for attr in attrs)
+        values = [obj.id, dumps(obj.to_json(True))]
+        values += [_column_value(getattr(obj, attr, None)) for attr in attrs]
+        updates = "".join(', "{0}" = excluded."{0}"'.format(attr)
+                          for attr in attrs)
+        conn.execute(
+            'INSERT INTO "{}" (id, data{}) VALUES ({}) ON CONFLICT(id) '
+            'DO UPDATE SET data = excluded.data{}'.format(
+                table, columns, ", ".join("?" * len(values)), updates),
+            values)
+
+    def save(self, obj: TypeVar('Base')):
+        """ Insert or update the row of obj
+        """
+        self._upsert(self._connection(), obj)
+
+    def save_many(self, objs: List[TypeVar('Base')]):
+        """ Insert or update the rows of objs in one transaction
+        """
+        conn = self._connection()
+        for obj in objs:
+            self._table(obj.__class__)
+        conn.execute("BEGIN")
+        try:
+            for obj in objs:
+                self._upsert(conn, obj)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def remove(self, obj: TypeVar('Base')):
+        """ Delete the row of obj
+        """
+        table = self._table(obj.__class__)
+        self._connection().execute(
+            'DELETE FROM "{}" WHERE id = ?'.format(table), (obj.id,))
+
+    def remove_many(self, objs: List[TypeVar('Base')]):
+        """ Delete the rows of objs in one transaction
+        """
+        conn = self._connection()
+        conn.execute("BEGIN")
+        try:
+            for obj in objs:
+                conn.execute('DELETE FROM "{}" WHERE id = ?'.format(
+                    self._table(obj.__class__)), (obj.id,))
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def count(self, cls) -> int:
+        """ Number of rows of cls
+        """
+        table = self._table(cls)
+        return self._connection().execute(
+            'SELECT COUNT(*) FROM "{}"'.format(table)).fetchone()[0]
+
+    def get(self, cls, obj_id: str) -> TypeVar('Base'):
+        """ Object of cls with id obj_id, or None
+        """
+        table = self._table(cls)
+        rows = self._connection().execute(
+            'SELECT data FROM "{}" WHERE id = ?'.format(table), (obj_id,))
+        objs = self._objects(cls, rows)
+        return objs[0] if objs else None
+
+    def scan(self, cls, after: str = None) -> Iterator[TypeVar('Base')]:
+        """ Iterate over the objects of cls in rowid order, starting after
+        the object with id after (KeyError if there is none)
+        """
+        table = self._table(cls)
+        rowid = 0
+        if after is not None:
+            row = self._connection().execute(
+                'SELECT rowid FROM "{}" WHERE id = ?'.format(table),
+                (after,)).fetchone()
+            if row is None:
+                raise KeyError(after)
+            rowid = row[0]
+        return self._scan_from(cls, table, rowid)
+
+    def _scan_from(self, cls, table: str,
+                   rowid: int) -> Iterator[TypeVar('Base')]:
+        """ Objects of cls after rowid, read SCAN_BATCH rows at a time
+        """
+        while True:
+            rows = self._connection().execute(
+                'SELECT rowid, data FROM "{}" WHERE rowid > ? '
+                'ORDER BY rowid LIMIT ?'.format(table),
+                (rowid, SCAN_BATCH)).fetchall()
+            if not rows:
+                return
+            rowid = rows[-1][0]
+            for _, data in rows:
+                yield cls(**loads(data))
+
+    def search(self, cls, attributes: dict) -> List[TypeVar('Base')]:
+        """ Objects of cls matching attributes
+
+        Indexed attributes are filtered by SQLite, the others in Python.
+        """
+        table = self._table(cls)
+        where = []
+        params = []
+        for attr in _columns(cls):
+            if attr not in attributes:
+                continue
+            test = _condition_sql(attr, attributes[attr])
+            if test is not None:
+                where.append(test[0])
+                params.extend(test[1])
+        sql = 'SELECT data FROM "{}"'.format(table)
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        rows = self._connection().execute(sql + " ORDER BY rowid", params)
+        return [obj for obj in self._objects(cls, rows)
+                if matches(obj, attributes)]
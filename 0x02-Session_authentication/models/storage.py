@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+""" Storage module
+
+Interface of the storage engines behind the Base model methods.
+"""
+from typing import TypeVar, Iterator, List
+
+
+class Condition():
+    """ Search condition on an attribute value, instead of equality
+    """
+
+    def matches(self, value) -> bool:
+        """ True if value satisfies the condition
+        """
+        raise NotImplementedError
+
+
+class Prefix(Condition):
+    """ String value starting with prefix
+    """
+
+    def __init__(self, prefix: str):
+        """ Initialize the condition
+        """
+        self.prefix = prefix
+
+    def matches(self, value) -> bool:
+        """ True if value is a string starting with prefix
+        """
+        return isinstance(value, str) and value.startswith(self.prefix)
+
+
+class Range(Condition):
+    """ Value between low and high, both included (None: unbounded)
+    """
+
+    def __init__(self, low=None, high=None):
+        """ Initialize the condition
+        """
+        self.low = low
+        self.high = high
+
+    def matches(self, value) -> bool:
+        """ True if value is not None and within the bounds
+        """
+        if value is None:
+            return False
+        return (self.low is None or self.low <= value) \
+            and (self.high is None or value <= self.high)
+
+
+def matches(obj: TypeVar('Base'), attributes: dict) -> bool:
+    """ True if obj has all the attribute values of attributes
+    (or values satisfying them, for Condition values)
+    """
+    for k, v in attributes.items():
+        if isinstance(v, Condition):
+            if not v.matches(getattr(obj, k)):
+                return False
+        elif (getattr(obj, k) != v):
+            return False
+    return True
+
+
+class Storage():
+    """ Storage engine interface
+
+    Every method takes the model class (or an instance of it), so one
+    engine can serve several models.
+    """
+
+    def load(self, cls):
+        """ (Re)load the objects of cls from persistent storage
+        """
+        raise NotImplementedError
+
+    def save_all(self, cls):
+        """ Persist every object of cls
+        """
+        raise NotImplementedError
+
+    def flush(self, cls):
+        """ Persist the pending writes of cls, if the engine defers any
+        """
+
+    def compact(self, cls):
+        """ Reclaim the space of superseded writes of cls, if any
+        """
+
+    def save(self, obj: TypeVar('Base')):
+        """ Insert or update obj
+        """
+        raise NotImplementedError
+
+    def save_many(self, objs: List[TypeVar('Base')]):
+        """ Insert or update several objects, in one write if the engine
+        can
+        """
+        for obj in objs:
+            self.save(obj)
+
+    def remove(self, obj: TypeVar('Base')):
+        """ Delete obj
+        """
+        raise NotImplementedError
+
+    def remove_many(self, objs: List[TypeVar('Base')]):
+        """ Delete several objects, in one write if the engine can
+        """
+        for obj in objs:
+            self.remove(obj)
+
+    def count(self, cls) -> int:
+        """ Number of objects of cls
+        """
+        raise NotImplementedError
+
+    def get(self, cls, obj_id: str) -> TypeVar('Base'):
+        """ Object of cls with id obj_id, or None
+        """
+        raise NotImplementedError
+
+    def scan(self, cls, after: str = None) -> Iterator[TypeVar('Base')]:
+        """ Iterate over the objects of cls in storage order, starting
+        after the object with id after (KeyError if there is none)
+        """
+        raise NotImplementedError
+
+    def search(self, cls, attributes: dict) -> List[TypeVar('Base')]:
+        """ Objects of cls whose attributes equal attributes (or satisfy
+        them, for Condition values)
+        """
+        raise NotImplementedError
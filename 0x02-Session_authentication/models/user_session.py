@@ -10,6 +10,9 @@ class UserSession(Base):
     This class represents a user session, extending the Base model.
     """
 
+    __slots__ = ('user_id', 'session_id')
+    indexed_attributes = ('session_id',)
+
     def __init__(self, *args: list, **kwargs: dict):
         """
         Initialize a UserSession instance.
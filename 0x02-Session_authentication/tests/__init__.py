@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Helpers shared by the tests and the benchmarks
+"""
+
+import importlib
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from contextlib import contextmanager
+
+from models import file_storage
+from models.base import Base
+from models.file_storage import FileStorage
+
+try:
+    import flask
+except ImportError:  # the auth package needs Flask
+    flask = None
+
+# Decorator of the tests that need Flask
+requires_flask = unittest.skipIf(flask is None, "Flask is not installed")
+
+
+def auth_class(module: str, name: str):
+    """
+    Class of the api.v1.auth package.
+
+    Args:
+        module (str): Module name in the package, e.g. "basic_auth".
+        name (str): Class name, e.g. "BasicAuth".
+
+    Returns:
+        The class, or None if Flask is not installed.
+    """
+    if flask is None:
+        return None
+    return getattr(importlib.import_module("api.v1.auth." + module), name)
+
+
+@contextmanager
+def temporary_storage(engine=FileStorage):
+    """
+    Empty working directory and a new storage engine for every model,
+    both restored on exit, once the background compactions (which write
+    to the working directory) are done.
+
+    Args:
+        engine: Storage engine factory, called in the new directory.
+
+    Yields:
+        str: Path of the working directory.
+    """
+    cwd = os.getcwd()
+    tmp = tempfile.mkdtemp()
+    storage = Base.storage
+    os.chdir(tmp)
+    try:
+        Base.storage = engine()
+        yield tmp
+    finally:
+        while file_storage.COMPACTING:
+            time.sleep(0.01)
+        Base.storage = storage
+        os.chdir(cwd)
+        shutil.rmtree(tmp)
+
+
+class StorageTestCase(unittest.TestCase):
+    """
+    Test case run in an empty working directory, on a new storage engine
+    """
+
+    def engine(self):
+        """ Storage engine of the test """
+        return FileStorage()
+
+    def setUp(self):
+        """ Enter the temporary storage until the test is cleaned up """
+        storage = temporary_storage(self.engine)
+        self.tmp = storage.__enter__()
+        self.addCleanup(storage.__exit__, None, None, None)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Reference Basic authentication parsing: the regular expression based
+implementation BasicAuth had before its fast path, kept as the oracle of
+the parity tests and the baseline of the benchmarks
+"""
+import base64
+import binascii
+import re
+from typing import Tuple
+
+from api.v1.auth.basic_auth import BasicAuth
+
+
+class ReferenceBasicAuth(BasicAuth):
+    """BasicAuth with the original header parsing."""
+
+    def extract_base64_authorization_header(
+            self,
+            authorization_header: str) -> str:
+        """Extracts the Base64 part of the Authorization header.
+
+        Args:
+            authorization_header: The Authorization header string.
+
+        Returns:
+            The Base64 token string if found, else None.
+        """
+        if type(authorization_header) == str:
+            pattern = r'Basic (?P<token>.+)'
+            field_match = re.fullmatch(pattern, authorization_header.strip())
+            if field_match is not None:
+                return field_match.group('token')
+        return None
+
+    def decode_base64_authorization_header(
+            self,
+            base64_authorization_header: str,
+            ) -> str:
+        """Decodes a base64-encoded authorization header.
+
+        Args:
+            base64_authorization_header: The Base64 encoded header.
+
+        Returns:
+            The decoded string if successfully decoded, else None (raises
+            ValueError for non-ASCII input).
+        """
+        if type(base64_authorization_header) == str:
+            try:
+                res = base64.b64decode(
+                    base64_authorization_header,
+                    validate=True,
+                )
+                return res.decode('utf-8')
+            except (binascii.Error, UnicodeDecodeError):
+                return None
+
+    def extract_user_credentials(
+            self,
+            decoded_base64_authorization_header: str,
+            ) -> Tuple[str, str]:
+        """Extracts user credentials from a base64-decoded header.
+
+        Args:
+            decoded_base64_authorization_header: Decoded Base64 header.
+
+        Returns:
+            Tuple containing user email and password.
+        """
+        if type(decoded_base64_authorization_header) == str:
+            pattern = r'(?P<user>[^:]+):(?P<password>.+)'
+            field_match = re.fullmatch(
+                pattern,
+                decoded_base64_authorization_header.strip(),
+            )
+            if field_match is not None:
+                return field_match.group('user'), \
+                    field_match.group('password')
+        return None, None
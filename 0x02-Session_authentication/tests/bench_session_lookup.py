@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+SessionDBAuth lookups with 1M persisted sessions: user_id_for_session_id
+through the session_id index, against the full scan every lookup did
+without it
+
+Run from the project root: python3 -m tests.bench_session_lookup [COUNT]
+"""
+
+import os
+import random
+import sys
+import time
+import uuid
+from unittest import mock
+
+from api.v1.auth.session_db_auth import SessionDBAuth
+from models.user_session import UserSession
+from tests import temporary_storage
+
+SESSIONS = 1000000
+LOOKUPS = 200
+SCANS = 3
+
+
+def main(count: int):
+    """
+    Print the load time of the sessions, then the time per lookup with
+    and without the index.
+    """
+    session_ids = [str(uuid.uuid4()) for _ in range(count)]
+    UserSession.load_from_file()
+    UserSession.save_many([UserSession(user_id="u{}".format(i),
+                                       session_id=session_id)
+                           for i, session_id in enumerate(session_ids)])
+    UserSession.save_to_file()
+    start = time.perf_counter()
+    with mock.patch.dict(os.environ, SESSION_NAME="session_id",
+                         SESSION_DURATION="0"):
+        auth = SessionDBAuth()
+    print("{} sessions loaded in {:.1f} s".format(
+        count, time.perf_counter() - start))
+
+    sample = random.Random(0).sample(range(count), LOOKUPS)
+    start = time.perf_counter()
+    for i in sample:
+        assert auth.user_id_for_session_id(session_ids[i]) == \
+            "u{}".format(i)
+    print("indexed   {:10.1f} us per lookup".format(
+        (time.perf_counter() - start) / LOOKUPS * 1e6))
+
+    start = time.perf_counter()
+    for i in sample[:SCANS]:
+        found = [user_session for user_session in UserSession.all()
+                 if user_session.session_id == session_ids[i]]
+        assert found[0].user_id == "u{}".format(i)
+    print("full scan {:10.1f} us per lookup".format(
+        (time.perf_counter() - start) / SCANS * 1e6))
+
+
+if __name__ == "__main__":
+    with temporary_storage():
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else SESSIONS)
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Throughput of SessionAuth with 1 to 32 threads: 9 lookups for every
+create and destroy, over 10000 live sessions
+
+Run from the project root: python3 -m tests.bench_session_store [STORE]
+with STORE one of memory (default), memory1 (one shard) or sqlite
+"""
+
+import os
+import sys
+import threading
+import time
+
+from api.v1.auth.session_auth import SessionAuth
+from api.v1.auth.session_store import SessionRegistry, SQLiteSessionStore
+from tests import temporary_storage
+
+OPERATIONS = 200000
+SESSIONS = 10000
+
+
+class Request:
+    """ Request with only a session cookie """
+
+    def __init__(self, session_id):
+        """ Initialize the request """
+        self.cookies = {"session_id": session_id}
+
+
+def throughput(auth, session_ids, threads: int) -> float:
+    """
+    Best operations per second of 3 runs with threads threads.
+    """
+    per_thread = OPERATIONS // threads
+
+    def work():
+        for i in range(per_thread):
+            if i % 10 == 0:
+                auth.destroy_session(Request(auth.create_session("v")))
+            else:
+                auth.user_id_for_session_id(session_ids[i % SESSIONS])
+
+    best = 0
+    for _ in range(3):
+        workers = [threading.Thread(target=work) for _ in range(threads)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        best = max(best, per_thread * threads
+                   / (time.perf_counter() - start))
+    return best
+
+
+def main(store_type: str):
+    """
+    Print the throughput for 1, 2, 4, 8, 16 and 32 threads.
+    """
+    stores = {"memory": lambda: SessionRegistry(),
+              "memory1": lambda: SessionRegistry(1),
+              "sqlite": lambda: SQLiteSessionStore("bench.sqlite3")}
+    os.environ["SESSION_NAME"] = "session_id"
+    auth = SessionAuth()
+    auth.user_id_by_session_id = stores[store_type]()
+    session_ids = [auth.create_session("u") for _ in range(SESSIONS)]
+    for threads in (1, 2, 4, 8, 16, 32):
+        print("{:2d} threads: {:9.0f} ops/s".format(
+            threads, throughput(auth, session_ids, threads)))
+
+
+if __name__ == "__main__":
+    with temporary_storage():
+        main(sys.argv[1] if len(sys.argv) > 1 else "memory")
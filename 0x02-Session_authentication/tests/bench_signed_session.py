@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Lookups per second of SignedSessionAuth (no store) against SessionDBAuth
+on each storage engine, over 2000 session IDs among 100k sessions
+
+Run from the project root: python3 -m tests.bench_signed_session [COUNT]
+"""
+
+import os
+import sys
+import timeit
+from unittest import mock
+
+from api.v1.auth.session_db_auth import SessionDBAuth
+from api.v1.auth.signed_session_auth import SignedSessionAuth
+from models.file_storage import FileStorage
+from models.sqlite_storage import SQLiteStorage
+from models.user_session import UserSession
+from tests import temporary_storage
+
+SESSIONS = 100000
+LOOKUPS = 2000
+
+
+def lookups_per_second(auth, session_ids: list) -> float:
+    """
+    Best lookups per second of 5 passes over session_ids.
+    """
+    lookup = auth.user_id_for_session_id
+    best = min(timeit.repeat(lambda: [lookup(session_id)
+                                      for session_id in session_ids],
+                             number=1, repeat=5))
+    return len(session_ids) / best
+
+
+def db_sessions(count: int) -> tuple:
+    """
+    SessionDBAuth over count new sessions of the current (empty) engine,
+    and the IDs of LOOKUPS of them.
+    """
+    with mock.patch.dict(os.environ, SESSION_DURATION="0"):
+        auth = SessionDBAuth()
+    user_sessions = [UserSession(user_id="u{}".format(i),
+                                 session_id="s{}".format(i))
+                     for i in range(count)]
+    UserSession.save_many(user_sessions)
+    step = max(count // LOOKUPS, 1)
+    return auth, [user_session.session_id
+                  for user_session in user_sessions[::step][:LOOKUPS]]
+
+
+def main(count: int):
+    """
+    Print the lookups per second of every backend.
+    """
+    with mock.patch.dict(os.environ, SESSION_SECRET="bench",
+                         SESSION_DURATION="3600"):
+        signed = SignedSessionAuth()
+    session_ids = [signed.create_session("u{}".format(i))
+                   for i in range(LOOKUPS)]
+    print("{:<40} {:9.0f} lookups/s".format(
+        "SignedSessionAuth", lookups_per_second(signed, session_ids)))
+    engines = [("file store", FileStorage),
+               ("file store, multi-process",
+                lambda: FileStorage(multi_process=True)),
+               ("SQLite", SQLiteStorage)]
+    for name, engine in engines:
+        with temporary_storage(engine):
+            auth, session_ids = db_sessions(count)
+            print("{:<40} {:9.0f} lookups/s".format(
+                "SessionDBAuth, " + name,
+                lookups_per_second(auth, session_ids)))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else SESSIONS)
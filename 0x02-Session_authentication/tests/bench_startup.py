@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Startup time of the User store with 100k and 1M users: load_from_file
+of the JSON snapshot (eager) against the memory-mapped line-delimited
+snapshot (lazy_load), then the first get and searches by email
+
+Run from the project root: python3 -m tests.bench_startup [COUNT...]
+"""
+
+import sys
+import time
+
+from models.user import User
+from tests import temporary_storage
+
+COUNTS = (100000, 1000000)
+
+
+def timed(function) -> float:
+    """
+    Time of one call, in milliseconds.
+    """
+    start = time.perf_counter()
+    function()
+    return (time.perf_counter() - start) * 1e3
+
+
+def startup(lazy_load: bool, count: int) -> tuple:
+    """
+    Snapshot the store in the format of lazy_load, and time its load,
+    a get and two searches by email, in milliseconds.
+    """
+    User.lazy_load = lazy_load
+    User.save_to_file()
+    user_id = User.search({'email': 'user{}@x'.format(count // 2)})[0].id
+    return (timed(User.load_from_file),
+            timed(lambda: User.get(user_id)),
+            timed(lambda: User.search({'email': 'user1@x'})),
+            timed(lambda: User.search({'email': 'user2@x'})))
+
+
+def main(counts):
+    """
+    Print the times of both modes for every store size.
+    """
+    lazy_load = User.lazy_load
+    try:
+        for count in counts:
+            with temporary_storage():
+                User.lazy_load = False
+                User.load_from_file()
+                User.save_many([User(email="user{}@x".format(i),
+                                     first_name="First{}".format(i))
+                                for i in range(count)])
+                for mode in (False, True):
+                    print("{:8d} users, {:5}: load {:8.1f} ms, get {:6.2f}"
+                          " ms, first search {:7.2f} ms, next {:5.2f} ms"
+                          .format(count, "lazy" if mode else "eager",
+                                  *startup(mode, count)))
+    finally:
+        User.lazy_load = lazy_load
+
+
+if __name__ == "__main__":
+    main([int(count) for count in sys.argv[1:]] or COUNTS)
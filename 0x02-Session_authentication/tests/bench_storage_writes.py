@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Writes per second of User.save on stores of 10k, 100k and 1M users: one
+journal line per save, against the full snapshot rewrite of
+save_to_file (what every save cost before the journal)
+
+Run from the project root: python3 -m tests.bench_storage_writes [COUNT...]
+"""
+
+import random
+import sys
+import time
+
+from models import file_storage
+from models.user import User
+from tests import temporary_storage
+
+COUNTS = (10000, 100000, 1000000)
+WRITES = 2000
+
+
+def populate(count: int) -> list:
+    """
+    Save count users, in one snapshot.
+    """
+    users = [User(email="user{}@example.com".format(i),
+                  first_name="First{}".format(i), last_name="Last")
+             for i in range(count)]
+    User.save_many(users)
+    User.save_to_file()
+    return users
+
+
+def journal_writes(users: list) -> float:
+    """
+    Saves per second of WRITES updates to random users.
+    """
+    rng = random.Random(0)
+    sample = [rng.choice(users) for _ in range(WRITES)]
+    start = time.perf_counter()
+    for i, user in enumerate(sample):
+        user.first_name = "Renamed{}".format(i)
+        user.save()
+    file_storage.flush_all()
+    return WRITES / (time.perf_counter() - start)
+
+
+def snapshot_writes() -> float:
+    """
+    Full snapshot rewrites per second, best of 3.
+    """
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        User.save_to_file()
+        best = min(best, time.perf_counter() - start)
+    return 1 / best
+
+
+def main(counts):
+    """
+    Print the writes per second of both paths for every store size.
+    """
+    for count in counts:
+        with temporary_storage():
+            User.load_from_file()
+            users = populate(count)
+            print("{:8d} users: {:9.0f} writes/s journal, {:9.2f} writes/s"
+                  " full rewrite".format(count, journal_writes(users),
+                                         snapshot_writes()))
+
+
+if __name__ == "__main__":
+    main([int(count) for count in sys.argv[1:]] or COUNTS)
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Parity tests of the BasicAuth header parsing against the reference
+(regular expression based) implementation
+"""
+
+import base64
+import itertools
+import os
+import random
+import unittest
+from unittest import mock
+
+from models.user import User
+from tests import StorageTestCase, auth_class, requires_flask
+
+BasicAuth = auth_class("basic_auth", "BasicAuth")
+if BasicAuth is not None:
+    from tests.basic_auth_reference import ReferenceBasicAuth
+
+CREDENTIALS = ["bob@x:pw", "bob@x:bad", ":pw", "bob@x:", "bob@x", "a:b:c",
+               "u@x:p:w:d", "é@x:pässwörd", "bob@x:p\nw", "bo\nb@x:pw", "",
+               ":", "::", " bob@x:pw ", "bob@x:pw\n", "\xa0bob@x:pw\u3000"]
+PREFIXES = ["Basic ", "basic ", "Basic", "Basic  ", " Basic ", "Bearer ",
+            "\tBasic ", "Basic\t", "\u3000Basic "]
+SUFFIXES = ["", " ", "\n", "\u2003"]
+
+
+def tokens() -> list:
+    """
+    Base64 tokens: valid ones, damaged ones and random strings.
+    """
+    result = []
+    for credentials in CREDENTIALS:
+        t = base64.b64encode(credentials.encode()).decode()
+        half = len(t) // 2
+        result += [t, t.rstrip("="), t + "=", t + "==", "=" + t,
+                   t[:half] + "=" + t[half:], t + "A", t + "AAAA", t + "\n",
+                   t + " x", t + "é", t.lower(), t.replace("+", "-")]
+    result += [base64.b64encode(b"\xff\xfe:pw").decode(),
+               base64.b64encode(b"bob@x:\xc3").decode(), "!!!!", "====",
+               "", "QQ", "QQ=", "QQ==", "QQ===", "QUJD", "QUJD=",
+               "QUJDRA==QUJD", "QU JD", "QU\nJD"]
+    rng = random.Random(0)
+    alphabet = "ABCabc012+/=: \t\n\xa0é"
+    for _ in range(5000):
+        result.append("".join(rng.choice(alphabet)
+                              for _ in range(rng.randint(0, 12))))
+    return result
+
+
+def outcome(method, *args):
+    """
+    Result of a call, or the name of the exception it raised.
+    """
+    try:
+        return "ok", method(*args)
+    except Exception as e:
+        return "raise", type(e).__name__
+
+
+class Request:
+    """ Request with only an Authorization header """
+
+    def __init__(self, authorization):
+        """ Initialize the request """
+        self.headers = {'Authorization': authorization}
+
+
+@requires_flask
+class TestParity(StorageTestCase):
+    """
+    BasicAuth accepts and rejects exactly what the reference does, except
+    non-ASCII tokens: rejected instead of raising ValueError
+    """
+
+    def setUp(self):
+        """ A few users, in an empty working directory """
+        super().setUp()
+        User.load_from_file()
+        for email, password in [("bob@x", "pw"), ("a:b", "c"),
+                                ("é@x", "pässwörd"), ("u@x", "p:w:d")]:
+            user = User(email=email)
+            user.password = password
+            user.save()
+        with mock.patch.dict(os.environ, BASIC_AUTH_CACHE_SIZE="0"):
+            self.reference = ReferenceBasicAuth()
+            self.auth = BasicAuth()
+        self.tokens = tokens()
+
+    def assertSameOutcome(self, name, *args):
+        """ Both implementations agree on one call """
+        expected = outcome(getattr(self.reference, name), *args)
+        got = outcome(getattr(self.auth, name), *args)
+        if expected == ("raise", "ValueError") and not args[0].isascii():
+            expected = ("ok", None)
+        self.assertEqual(got, expected, (name, args))
+
+    def test_extract_base64_authorization_header(self):
+        """ Headers: prefixes, tokens and trailing whitespace """
+        for prefix, token, suffix in itertools.product(
+                PREFIXES, self.tokens[:400], SUFFIXES):
+            self.assertSameOutcome("extract_base64_authorization_header",
+                                   prefix + token + suffix)
+
+    def test_decode_base64_authorization_header(self):
+        """ Tokens: padding, alphabet and encodings """
+        for token in self.tokens:
+            self.assertSameOutcome("decode_base64_authorization_header",
+                                   token)
+
+    def test_extract_user_credentials(self):
+        """ Decoded credentials: separators, blanks and line breaks """
+        rng = random.Random(1)
+        for decoded in CREDENTIALS + [
+                "".join(rng.choice("ab:\n \xa0\u2003é")
+                        for _ in range(rng.randint(0, 8)))
+                for _ in range(5000)]:
+            self.assertSameOutcome("extract_user_credentials", decoded)
+
+    def test_wrong_types(self):
+        """ Anything but a str is rejected """
+        for value in (None, 5, b"Basic Ym9iQHg6cHc="):
+            self.assertSameOutcome("extract_base64_authorization_header",
+                                   value)
+            self.assertIsNone(
+                self.auth.decode_base64_authorization_header(value))
+            self.assertEqual(self.auth.extract_user_credentials(value),
+                             (None, None))
+
+    def test_current_user(self):
+        """ The whole pipeline, down to the user found """
+        for prefix, token in itertools.product(PREFIXES, self.tokens):
+            request = Request(prefix + token)
+            expected = outcome(self.reference.current_user, request)
+            got = outcome(self.auth.current_user, request)
+            if expected == ("raise", "ValueError"):
+                expected = ("ok", None)
+            self.assertEqual(
+                (got[0], getattr(got[1], "id", got[1])),
+                (expected[0], getattr(expected[1], "id", expected[1])),
+                prefix + token)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Model tests, run against every storage engine
+"""
+
+import random
+import threading
+import unittest
+from datetime import datetime, timedelta
+
+from models import file_storage
+from models.file_storage import FileStorage
+from models.sqlite_storage import SQLiteStorage
+from models.storage import Prefix, Range, matches
+from models.user import User
+from models.user_session import UserSession
+from tests import StorageTestCase
+
+
+class ModelTests:
+    """
+    Tests shared by the engines, mixed in a StorageTestCase per engine
+    """
+
+    lazy_load = False
+
+    def setUp(self):
+        """ Empty store, with the lazy_load setting of the test case """
+        super().setUp()
+        self.addCleanup(setattr, User, 'lazy_load', User.lazy_load)
+        User.lazy_load = self.lazy_load
+        User.load_from_file()
+        UserSession.load_from_file()
+
+    def reload(self):
+        """ Persist everything and read it back """
+        User.save_to_file()
+        User.load_from_file()
+
+    def test_crud(self):
+        """ Save, get, search, update and remove """
+        self.assertEqual((User.count(), list(User.all())), (0, []))
+        u = User(email="a@x", first_name="A")
+        u.password = "pw"
+        u.save()
+        v = User(email="b@x")
+        v.save()
+        w = User(email=None)
+        w.save()
+        self.assertEqual([x.id for x in User.all()], [u.id, v.id, w.id])
+        self.assertTrue(User.get(u.id).is_valid_password("pw"))
+        self.assertIsNone(User.get("nope"))
+        self.assertEqual([x.id for x in User.search({'email': 'a@x'})],
+                         [u.id])
+        self.assertEqual([x.id for x in User.search({'email': None})],
+                         [w.id])
+        self.assertEqual(User.search({'email': 'a@x', 'first_name': 'B'}),
+                         [])
+        u.email = "c@x"
+        u.save()
+        self.assertEqual(User.search({'email': 'a@x'}), [])
+        self.assertEqual(User.search({'email': 'c@x'})[0].id, u.id)
+        User.get(v.id).remove()
+        self.assertEqual(User.count(), 2)
+        self.reload()
+        self.assertEqual(User.count(), 2)
+        self.assertEqual(User.get(u.id).email, "c@x")
+        self.assertEqual(User.get(u.id).to_json(), u.to_json())
+        User.compact()
+        User.load_from_file()
+        self.assertEqual([x.id for x in User.all()], [u.id, w.id])
+
+    def test_many(self):
+        """ Batched saves and removes """
+        users = [User(email="{}@x".format(i)) for i in range(50)]
+        User.save_many(users)
+        User.remove_many(users[:20])
+        self.reload()
+        self.assertEqual([x.id for x in User.all()],
+                         [x.id for x in users[20:]])
+
+    def test_user_session(self):
+        """ Sessions found by their session ID """
+        UserSession(user_id="u1", session_id="s1").save()
+        self.assertEqual(
+            UserSession.search({'session_id': 's1'})[0].user_id, "u1")
+
+    def test_conditions(self):
+        """ Prefix and Range searches agree with a full scan """
+        rng = random.Random(1)
+        base = datetime(2020, 1, 1)
+        names = ["ann", "anna", "bob", "bobby", "carl", None, "ängel", ""]
+        users = []
+        for i in range(600):
+            user = User(
+                email=rng.choice(names + ["{}{}@x".format(
+                    rng.choice(names[:5]), i)]),
+                first_name=rng.choice(names),
+                created_at=(base + timedelta(hours=rng.randint(0, 500)))
+                .strftime("%Y-%m-%dT%H:%M:%S"))
+            user.save()
+            users.append(user)
+        for user in rng.sample(users, 60):
+            user.remove()
+            users.remove(user)
+        for user in rng.sample(users, 60):
+            user.email = rng.choice(names)
+            user.save()
+        hours = [(0, 0), (10, 50), (499, 10), (-5, 3)]
+        queries = [{'email': Prefix(p)}
+                   for p in ["", "a", "ann", "bob", "z", "ä", "carl1"]]
+        queries += [{'email': name} for name in names]
+        queries += [{'created_at': Range(base + timedelta(hours=a),
+                                         base + timedelta(hours=a + d))}
+                    for a, d in hours]
+        queries += [{'created_at': Range(None, base + timedelta(hours=99))},
+                    {'created_at': Range(base + timedelta(hours=400))},
+                    {'email': Prefix("b"), 'first_name': 'anna'},
+                    {'first_name': Prefix('an')},
+                    {'email': Range('b', 'c')}]
+        for _ in range(2):
+            everyone = list(User.all())
+            for query in queries:
+                self.assertEqual(
+                    sorted(x.id for x in User.search(query)),
+                    sorted(x.id for x in everyone if matches(x, query)))
+            self.reload()
+
+    def test_json_values(self):
+        """ Values only the stdlib json module handles, and values no
+        backend can write
+        """
+        big = User(first_name=2 ** 70, last_name=float("nan"))
+        big.save()
+        with self.assertRaises(TypeError):
+            User(first_name={"a set"}).save()
+        self.assertEqual([x.id for x in User.all()], [big.id])
+        User.load_from_file()
+        self.reload()
+        user = User.get(big.id)
+        self.assertEqual(user.first_name, 2 ** 70)
+        self.assertNotEqual(user.last_name, user.last_name)
+        self.assertEqual(User.count(), 1)
+
+    def test_mixed_types(self):
+        """ Values of other types than the sorted index holds """
+        emails = ["a@x", 5, 2.5, True, {"k": "v"}, None]
+        users = [User(email=email) for email in emails]
+        for user in users:
+            user.save()
+        self.assertEqual([x.id for x in User.search({'email': Prefix('a')})],
+                         [users[0].id])
+        self.assertEqual(
+            sorted(x.id for x in User.search({'email': Range(1, 10)})),
+            sorted([users[1].id, users[2].id, users[3].id]))
+        self.reload()
+        self.assertEqual(User.count(), len(emails))
+        for user, email in zip(users, emails):
+            self.assertIn(user.id,
+                          [x.id for x in User.search({'email': email})])
+        self.assertEqual([x.id for x in User.search({'email': 'a@x'})],
+                         [users[0].id])
+
+    def test_scan(self):
+        """ Scans in id order, across batches and concurrent changes """
+        ids = []
+        for i in range(1200):
+            user = User(email="{}@x".format(i))
+            user.save()
+            ids.append(user.id)
+        self.reload()
+        self.assertEqual([x.id for x in User.scan()], ids)
+        self.assertEqual([x.id for x in User.scan(ids[499])], ids[500:])
+        User.get(ids[3]).remove()
+        del ids[3]
+        scan = User.scan(ids[10])
+        User.get(ids[20]).remove()
+        del ids[20]
+        self.assertEqual([x.id for x in scan], ids[11:])
+        with self.assertRaises(KeyError):
+            list(User.scan("nope"))
+        scan = User.scan(ids[-3])
+        User.remove_many([User.get(x) for x in ids[:1000]])
+        del ids[:1000]
+        self.assertEqual([x.id for x in scan], ids[-2:])
+        user = User.get(ids[0])
+        user.remove()
+        user.save()
+        ids.append(ids.pop(0))
+        self.assertEqual([x.id for x in User.scan(ids[5])], ids[6:])
+        self.assertEqual([x.id for x in User.scan()], ids)
+
+    def test_threads(self):
+        """ Concurrent writers and readers keep the indexes consistent """
+        emails = ["u{}@x".format(i) for i in range(20)]
+        errors = []
+        stop = threading.Event()
+
+        def writer(seed):
+            rng = random.Random(seed)
+            mine = []
+            try:
+                for _ in range(300):
+                    if mine and rng.random() < 0.4:
+                        mine.pop(rng.randrange(len(mine))).remove()
+                        continue
+                    if mine and rng.random() < 0.3:
+                        user = rng.choice(mine)
+                    else:
+                        user = User()
+                        mine.append(user)
+                    user.email = rng.choice(emails + [5, None])
+                    user.save()
+            except Exception as e:
+                errors.append(e)
+
+        def reader():
+            rng = random.Random(0)
+            while not stop.is_set():
+                try:
+                    User.search({"email": rng.choice(emails)})
+                    found = User.search({"email": Prefix("u1")})
+                    if len({x.id for x in found}) != len(found):
+                        errors.append("duplicate")
+                except Exception as e:
+                    errors.append(e)
+
+        writers = [threading.Thread(target=writer, args=(seed,))
+                   for seed in range(4)]
+        readers = [threading.Thread(target=reader) for _ in range(2)]
+        for thread in writers + readers:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        stop.set()
+        for thread in readers:
+            thread.join()
+        self.assertEqual(errors, [])
+        everyone = list(User.all())
+        for query in [{"email": Prefix("u")}] + [{"email": email}
+                                                 for email in emails]:
+            self.assertEqual(
+                sorted(x.id for x in User.search(query)),
+                sorted(x.id for x in everyone if matches(x, query)))
+        count = User.count()
+        User.load_from_file()
+        self.assertEqual(User.count(), count)
+
+
+class TestFileStorage(ModelTests, StorageTestCase):
+    """ FileStorage, single process """
+
+    def test_torn_journal(self):
+        """ A torn journal tail is dropped before the next append """
+        User(email="a").save()
+        journal = ".db_User.journal"
+        file_storage.flush_all()
+        with open(journal, "ab") as f:
+            f.write(b'{"op":"upsert","id":"x","obj":{"em')
+        User.load_from_file()
+        for i in range(3):
+            User(email="b{}".format(i)).save()
+        User.load_from_file()
+        self.assertEqual(User.count(), 4)
+
+
+class TestLazyFileStorage(ModelTests, StorageTestCase):
+    """ FileStorage with a memory-mapped snapshot """
+
+    lazy_load = True
+
+
+class TestMultiProcessFileStorage(TestFileStorage):
+    """ FileStorage shared by several processes """
+
+    def engine(self):
+        """ Storage engine under test """
+        return FileStorage(multi_process=True)
+
+
+class TestSQLiteStorage(ModelTests, StorageTestCase):
+    """ SQLiteStorage """
+
+    def engine(self):
+        """ Storage engine under test """
+        return SQLiteStorage()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+resolve_user looks the user up once per request
+"""
+
+import base64
+import os
+import unittest
+from unittest import mock
+
+from models.user import User
+from models.user_session import UserSession
+from tests import StorageTestCase, auth_class, flask, requires_flask
+
+BasicAuth = auth_class("basic_auth", "BasicAuth")
+SessionAuth = auth_class("session_auth", "SessionAuth")
+SessionDBAuth = auth_class("session_db_auth", "SessionDBAuth")
+
+
+@requires_flask
+class TestResolveUser(StorageTestCase):
+    """
+    The before_request hook and the views of a request share one lookup
+    """
+
+    def setUp(self):
+        """ One user, in an empty working directory """
+        super().setUp()
+        User.load_from_file()
+        UserSession.load_from_file()
+        self.user = User(email="a@x")
+        self.user.password = "pw"
+        self.user.save()
+        self.app = flask.Flask(__name__)
+        env = mock.patch.dict(os.environ, SESSION_NAME="session_id",
+                              BASIC_AUTH_CACHE_SIZE="0")
+        env.start()
+        self.addCleanup(env.stop)
+
+    def assertOneLookup(self, auth, headers):
+        """ Three requests, each resolving the user twice """
+        for _ in range(3):
+            with mock.patch.object(User, 'search', wraps=User.search) \
+                    as search, \
+                    mock.patch.object(User, 'get', wraps=User.get) as get, \
+                    self.app.test_request_context('/api/v1/users/me',
+                                                  headers=headers):
+                user = auth.resolve_user(flask.request)
+                self.assertEqual(user.id, self.user.id)
+                self.assertIs(auth.resolve_user(flask.request), user)
+                self.assertEqual(search.call_count + get.call_count, 1)
+
+    def test_basic_auth(self):
+        """ Basic credentials: one User.search """
+        token = base64.b64encode(b"a@x:pw").decode()
+        self.assertOneLookup(BasicAuth(),
+                             {'Authorization': 'Basic ' + token})
+
+    def test_session_auth(self):
+        """ In-memory session: one User.get """
+        auth = SessionAuth()
+        session_id = auth.create_session(self.user.id)
+        self.assertOneLookup(
+            auth, {'Cookie': 'session_id={}'.format(session_id)})
+
+    def test_session_db_auth(self):
+        """ Persisted session: one User.get """
+        auth = SessionDBAuth()
+        session_id = auth.create_session(self.user.id)
+        self.assertOneLookup(
+            auth, {'Cookie': 'session_id={}'.format(session_id)})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+The SessionExpAuth sweeper survives a failing session store
+"""
+
+import os
+import threading
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from api.v1.auth.session_store import SessionRegistry
+from tests import StorageTestCase, auth_class, requires_flask
+
+SessionExpAuth = auth_class("session_exp_auth", "SessionExpAuth")
+
+
+@requires_flask
+class TestSweeper(StorageTestCase):
+    """
+    A failed sweep is logged and retried, its expired sessions kept
+    """
+
+    def setUp(self):
+        """ Three sessions, expired, on a store failing twice """
+        super().setUp()
+        with mock.patch.dict(os.environ, SESSION_DURATION="60",
+                             SESSION_SWEEP_INTERVAL="0"):
+            self.auth = SessionExpAuth()
+        self.auth.user_id_by_session_id = SessionRegistry()
+        self.auth._load_expiries()
+        clock = datetime.utcnow()
+        self.auth._now = lambda: clock
+        for i in range(3):
+            self.auth.create_session("u{}".format(i))
+        clock += timedelta(minutes=2)
+        self.failures = 2
+        expiries = self.auth._session_expiries
+
+        def flaky(session_ids):
+            if self.failures:
+                self.failures -= 1
+                raise OSError("database is locked")
+            return expiries(session_ids)
+
+        self.auth._session_expiries = flaky
+
+    def test_sweep_expired(self):
+        """ The entries popped by a failed sweep are swept by the next """
+        for _ in range(2):
+            with self.assertRaises(OSError):
+                self.auth.sweep_expired()
+            self.assertEqual(len(self.auth._expiry_heap), 3)
+        self.assertEqual(self.auth.sweep_expired(), 3)
+        self.assertEqual(self.auth.session_count(), 0)
+
+    def test_sweep_loop(self):
+        """ The sweeper thread logs the failures and keeps sweeping """
+        self.auth.sweep_interval = 0.01
+        self.addCleanup(setattr, self.auth, 'sweep_interval', 3600)
+        swept = threading.Event()
+        sweep_expired = self.auth.sweep_expired
+
+        def sweep():
+            if sweep_expired():
+                swept.set()
+
+        self.auth.sweep_expired = sweep
+        with self.assertLogs("api.v1.auth.session_exp_auth") as logs:
+            thread = threading.Thread(target=self.auth._sweep_loop,
+                                      daemon=True)
+            thread.start()
+            self.assertTrue(swept.wait(5))
+        self.assertEqual(len(logs.records), 2)
+        self.assertTrue(thread.is_alive())
+        self.assertEqual(self.auth.session_count(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
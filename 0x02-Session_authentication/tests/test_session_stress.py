@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Concurrent stress test of the session stores behind SessionAuth
+"""
+
+import os
+import sys
+import threading
+import time
+import unittest
+from unittest import mock
+
+from api.v1.auth.session_store import SessionRegistry, SQLiteSessionStore
+from tests import StorageTestCase, auth_class, requires_flask
+
+SessionAuth = auth_class("session_auth", "SessionAuth")
+SessionExpAuth = auth_class("session_exp_auth", "SessionExpAuth")
+
+THREADS = 8
+ROUNDS = 200
+
+
+class Request:
+    """ Request with only a session cookie """
+
+    def __init__(self, session_id):
+        """ Initialize the request """
+        self.cookies = {"session_id": session_id}
+
+
+@requires_flask
+class TestSessionStress(StorageTestCase):
+    """
+    Threads racing creates, lookups and double destroys, in lockstep
+    """
+
+    def setUp(self):
+        """ Frequent thread switches, in an empty working directory """
+        super().setUp()
+        self.addCleanup(sys.setswitchinterval, sys.getswitchinterval())
+        sys.setswitchinterval(1e-5)
+        env = mock.patch.dict(os.environ, SESSION_NAME="session_id",
+                              SESSION_DURATION="600",
+                              SESSION_SWEEP_INTERVAL="0")
+        env.start()
+        self.addCleanup(env.stop)
+
+    def stress(self, auth, store):
+        """
+        Every round, thread 0 creates a session while the others look it
+        up; each thread creates, checks and destroys twice a session of
+        its own; then all of them destroy the same shared session.
+        """
+        auth.user_id_by_session_id = store
+        lookup = auth.user_id_for_session_id
+
+        def preempted(session_id=None):
+            # yield right after the lookup, as a preempted thread would
+            user_id = lookup(session_id)
+            time.sleep(0)
+            return user_id
+
+        auth.user_id_for_session_id = preempted
+        shared = [auth.create_session("u") for _ in range(ROUNDS)]
+        latest = [None]
+        errors = []
+        wins = []
+        barrier = threading.Barrier(THREADS)
+
+        def worker(k):
+            user_id = "u{}".format(k)
+            try:
+                for i in range(ROUNDS):
+                    barrier.wait()
+                    if k == 0:
+                        latest[0] = auth.create_session("x")
+                    elif auth.user_id_for_session_id(latest[0]) \
+                            not in (None, "x"):
+                        errors.append("wrong user")
+                    session_id = auth.create_session(user_id)
+                    if auth.user_id_for_session_id(session_id) != user_id:
+                        errors.append("lost session")
+                    if not auth.destroy_session(Request(session_id)) \
+                            or auth.destroy_session(Request(session_id)):
+                        errors.append("destroyed twice")
+                    barrier.wait()
+                    if auth.destroy_session(Request(shared[i])):
+                        wins.append(i)
+            except threading.BrokenBarrierError:
+                pass
+            except Exception as e:
+                errors.append(e)
+                barrier.abort()
+
+        threads = [threading.Thread(target=worker, args=(k,))
+                   for k in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        # each shared session destroyed by exactly one thread
+        self.assertEqual(sorted(wins), list(range(ROUNDS)))
+        # only the sessions of thread 0 are left
+        self.assertEqual(len(store), ROUNDS)
+        self.assertEqual({store.get(session_id) for session_id in shared},
+                         {None})
+
+    def test_session_auth(self):
+        """ SessionAuth on a sharded registry """
+        self.stress(SessionAuth(), SessionRegistry())
+
+    def test_session_auth_one_shard(self):
+        """ SessionAuth on a registry with one lock """
+        self.stress(SessionAuth(), SessionRegistry(1))
+
+    def test_session_exp_auth(self):
+        """ SessionExpAuth on a sharded registry """
+        self.stress(SessionExpAuth(), SessionRegistry())
+
+    def test_session_auth_sqlite(self):
+        """ SessionAuth on a SQLite store """
+        self.stress(SessionAuth(),
+                    SQLiteSessionStore(os.path.join(self.tmp, "s.sqlite3")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Writes caused by N requests on sliding sessions
+"""
+
+import os
+import time
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from models.base import Base
+from models.user_session import UserSession
+from tests import StorageTestCase, auth_class, requires_flask
+
+SessionDBAuth = auth_class("session_db_auth", "SessionDBAuth")
+
+# Requests per test, spread over MINUTES, round robin over SESSIONS
+REQUESTS = 3000
+MINUTES = 30
+SESSIONS = 20
+
+
+@requires_flask
+class TestSessionWrites(StorageTestCase):
+    """
+    SessionDBAuth throttles the touches and coalesces their writes
+    """
+
+    def setUp(self):
+        """ Empty working directory, storage writes counted """
+        super().setUp()
+        UserSession.load_from_file()
+        self.writes = []
+        for name in ("save", "save_many"):
+            method = getattr(Base.storage, name)
+            patch = mock.patch.object(
+                Base.storage, name,
+                side_effect=lambda objs, _method=method:
+                    self.writes.append(objs) or _method(objs))
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def simulate(self, sliding: bool, touch_interval: int):
+        """
+        Serve REQUESTS requests, flushing the touches every minute of the
+        simulated clock as the touch flusher does.
+
+        Returns:
+            tuple: (authenticated requests, writes, objects written).
+        """
+        with mock.patch.dict(os.environ, SESSION_DURATION="600",
+                             SESSION_SWEEP_INTERVAL="0",
+                             SESSION_TOUCH_FLUSH_INTERVAL="0",
+                             SESSION_SLIDING="1" if sliding else "0",
+                             SESSION_TOUCH_INTERVAL=str(touch_interval)):
+            auth = SessionDBAuth()
+        clock = [datetime.utcnow()]
+        auth._now = lambda: clock[0]
+        session_ids = [auth.create_session("u{}".format(i))
+                       for i in range(SESSIONS)]
+        del self.writes[:]
+        step = timedelta(seconds=MINUTES * 60 / REQUESTS)
+        flushed_at = clock[0]
+        authenticated = 0
+        for i in range(REQUESTS):
+            clock[0] += step
+            session_id = session_ids[i % SESSIONS]
+            authenticated += auth.user_id_for_session_id(session_id) \
+                is not None
+            if clock[0] - flushed_at >= timedelta(minutes=1):
+                auth.flush_touches()
+                flushed_at = clock[0]
+        auth.flush_touches()
+        objects = sum(len(objs) if isinstance(objs, list) else 1
+                      for objs in self.writes)
+        return authenticated, len(self.writes), objects
+
+    def test_fixed_lifetime(self):
+        """ Without sliding, no request writes; sessions expire """
+        authenticated, writes, _ = self.simulate(False, 60)
+        self.assertEqual(writes, 0)
+        # 10 of the 30 minutes are within the lifetime
+        self.assertAlmostEqual(authenticated, REQUESTS / 3, delta=SESSIONS)
+
+    def test_sliding(self):
+        """ At most one write per flush, one object per touched session """
+        for touch_interval in (0, 60, 300):
+            authenticated, writes, objects = self.simulate(True,
+                                                           touch_interval)
+            self.assertEqual(authenticated, REQUESTS)
+            self.assertLessEqual(writes, MINUTES + 1)
+            self.assertLessEqual(objects, SESSIONS * (MINUTES + 1))
+            if touch_interval == 300:
+                # a session is touched at most every 5 minutes
+                self.assertLessEqual(objects, SESSIONS * (MINUTES // 5 + 1))
+
+    def test_touch_batch(self):
+        """ SESSION_TOUCH_BATCH pending touches force a write """
+        with mock.patch.dict(os.environ, SESSION_TOUCH_BATCH="5"):
+            authenticated, writes, objects = self.simulate(True, 60)
+        self.assertEqual(authenticated, REQUESTS)
+        self.assertLessEqual(objects, SESSIONS * (MINUTES + 1))
+        self.assertGreaterEqual(writes, objects // 5)
+
+    def test_touch_flusher(self):
+        """ Touches are saved without the sweeper, by their own thread """
+        with mock.patch.dict(os.environ, SESSION_DURATION="600",
+                             SESSION_SWEEP_INTERVAL="0",
+                             SESSION_SLIDING="1",
+                             SESSION_TOUCH_INTERVAL="0",
+                             SESSION_TOUCH_FLUSH_INTERVAL="0.01"):
+            auth = SessionDBAuth()
+        self.addCleanup(setattr, auth, 'touch_flush_interval', 3600)
+        session_id = auth.create_session("u")
+        del self.writes[:]
+        self.assertEqual(auth.user_id_for_session_id(session_id), "u")
+        deadline = time.monotonic() + 5
+        while not self.writes and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(len(self.writes), 1)
+        self.assertEqual(auth._touches, {})
+        self.assertIsNone(auth._sweeper)
+
+
+if __name__ == "__main__":
+    unittest.main()